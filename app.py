@@ -3,6 +3,13 @@ from onePassLlmModel.router_model_helper import load_router, predict_intent
 from onePassLlmModel.groq_ai_engine import GroqQueryDecomposer
 from onePassLlmModel.gpt_ai_engine import GptQueryDecomposer
 from onePassLlmModel.sql_compiler import JSONToSQLCompiler
+from onePassLlmModel.semantic_resources import get_semantic_resources
+from onePassLlmModel.semantic_cache import SemanticCache
+import pandas as pd
+from bird_db_reader import BirdDBReader
+
+PREVIEW_ROWS = 1000
+PREVIEW_TIMEOUT_SECONDS = 10
 
 st.set_page_config(page_title="BirdSQL Execution Plan", layout="wide")
 
@@ -11,9 +18,20 @@ def init_models():
     tokenizer, model = load_router("./my_router_model")
     decomposerGROQ = GroqQueryDecomposer("info/database_info.json")
     decomposerGPT = GptQueryDecomposer("info/database_info.json")
-    return tokenizer, model, decomposerGPT, decomposerGROQ
+    semantic_resources = get_semantic_resources()
+    # Load the embedding model up front instead of on the first SEMANTIC value.
+    semantic_resources.embedding_function
+    return tokenizer, model, decomposerGPT, decomposerGROQ, semantic_resources
+
+tokenizer, model, decomposerGPT, decomposerGROQ, semantic_resources = init_models()
 
-tokenizer, model, decomposerGPT, decomposerGROQ = init_models()
+@st.cache_resource
+def init_semantic_cache():
+    return SemanticCache()
+
+@st.cache_resource
+def init_db_reader():
+    return BirdDBReader("financial.sqlite")
 
 st.sidebar.title("🗄️ Control Panel")
 selected_db = st.sidebar.selectbox("Active Model", ["GROQ", "GPT"])
@@ -56,7 +74,7 @@ if user_input:
                 st.warning("Decomposer returned no tasks for this query.")
             else:
                 has_error = any(not task.get("is_achievable", True) for task in tasks)
-                compiler = JSONToSQLCompiler(response)
+                compiler = JSONToSQLCompiler(response, resources=semantic_resources, semantic_cache=init_semantic_cache())
 
                 if has_error:
                     st.subheader("Execution Plan (Errors Detected)")
@@ -88,4 +106,15 @@ if user_input:
                         final_sql = compiler.compile()
                         st.code(final_sql, language="sql")                     
                     except Exception as e:
-                        st.error(f"Compilation Error: {e}")
\ No newline at end of file
+                        st.error(f"Compilation Error: {e}")
+                    else:
+                        st.subheader(f"Result Preview (first {PREVIEW_ROWS} rows)")
+                        try:
+                            result = init_db_reader().run_columnar_query(
+                                final_sql, max_rows=PREVIEW_ROWS, timeout_seconds=PREVIEW_TIMEOUT_SECONDS
+                            )
+                            st.dataframe(result.to_pandas())
+                            st.caption("Column summary")
+                            st.dataframe(pd.DataFrame(result.summary()))
+                        except Exception as e:
+                            st.error(f"Execution Error: {e}")
\ No newline at end of file
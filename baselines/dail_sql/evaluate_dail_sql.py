@@ -6,6 +6,7 @@ import argparse
 import pandas as pd
 from tqdm import tqdm
 from bird_evaluator import BirdEvaluator
+from bird_db_reader import scaled_filename
 
 def load_ground_truth(dev_path, append_path):
     if not os.path.exists(dev_path):
@@ -44,8 +45,23 @@ def main():
     parser.add_argument("--pred_file", type=str, default="baselines/dail_sql/results.json")
     parser.add_argument("--dev_path", type=str, default="data/dev_20240627/dev.json")
     parser.add_argument("--append_path", type=str, default="data/dev_20240627/dev_tied_append.json")
-    parser.add_argument("--db_path", type=str, default="data/dev_20240627/dev_databases/financial/financial.sqlite")
+    parser.add_argument("--db_path", type=str, default="financial.sqlite")
     parser.add_argument("--output", type=str, default="results/dail_sql_final_report.json")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall-clock budget (seconds) per predicted query")
+    parser.add_argument("--max_vm_steps", type=int, default=None, help="SQLite VM-step budget per predicted query")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel evaluation workers")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--accelerated", action="store_true", help="Read from the indexed copy built by build_accelerated_db.py")
+    parser.add_argument("--db_mode", type=str, default="file", choices=["file", "memory", "mmap"],
+                        help="Serve queries from the file, an in-memory copy or a memory-mapped file")
+    parser.add_argument("--memory_limit_mb", type=int, default=2048, help="Largest database copied into memory")
+    parser.add_argument("--efficiency_runs", type=int, default=0,
+                        help="Re-run matching predictions and their GT this many times to compute VES (0: off)")
+    parser.add_argument("--isolated_workers", type=int, default=0,
+                        help="Run predicted SQL in this many memory-capped worker processes (0: in-process)")
+    parser.add_argument("--worker_memory_mb", type=int, default=1024, help="Memory cap of each SQL worker process")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Evaluate on the <db>_x<scale>.sqlite copy built by scale_financial_db.py (1: the original)")
     args = parser.parse_args()
 
     print("Loading ground truth data...")
@@ -58,7 +74,17 @@ def main():
     with open(args.pred_file, 'r', encoding='utf-8') as f:
         predictions = json.load(f)
 
-    evaluator = BirdEvaluator(db_filename=args.db_path)
+    evaluator = BirdEvaluator(
+        db_filename=scaled_filename(args.db_path, args.scale),
+        timeout_seconds=args.timeout,
+        max_vm_steps=args.max_vm_steps,
+        prefer_accelerated=args.accelerated,
+        db_mode=args.db_mode,
+        memory_limit_mb=args.memory_limit_mb,
+        efficiency_runs=args.efficiency_runs,
+        isolated_workers=args.isolated_workers,
+        worker_memory_limit_mb=args.worker_memory_mb
+    )
     
     stats = {
         "total": 0,
@@ -68,15 +94,19 @@ def main():
         "soft_match": 0,
         "super_soft_match": 0,
         "wrong": 0,
+        "timeouts": 0,
         "errors": 0,
-        "missing": 0
+        "missing": 0,
+        "ves_sum": 0.0
     }
     
     results_detail = []
 
     print("Starting evaluation...")
     
-    for _, row in tqdm(gt_df.iterrows(), total=len(gt_df)):
+    jobs = []
+
+    for _, row in gt_df.iterrows():
         q_id = str(row.get('question_id', ''))
         nl_query = row.get('question', '')
         gt_sql = row['SQL']
@@ -94,20 +124,31 @@ def main():
 
         pred_sql = clean_dail_sql(pred_sql_raw)
         
-        eval_result = evaluator.evaluate_query(
-            query_id=q_id,
-            natural_language_query=nl_query,
-            gt_sql=gt_sql,
-            pred_sql=pred_sql,
-            token_stats={}
-        )
-        
+        # Placeholder keeps the report in dataset order; filled once evaluated.
+        results_detail.append(None)
+        jobs.append((len(results_detail) - 1, {
+            "query_id": q_id,
+            "natural_language_query": nl_query,
+            "gt_sql": gt_sql,
+            "pred_sql": pred_sql,
+            "token_stats": {}
+        }))
+
+    eval_results = evaluator.evaluate_many(
+        [item for _, item in jobs],
+        workers=args.workers,
+        use_processes=args.processes
+    )
+
+    for (position, _), eval_result in tqdm(zip(jobs, eval_results), total=len(jobs)):
         stats["total"] += 1
         match_type = eval_result.get("match_type", "WRONG")
         execution_status = eval_result.get("execution_status", "UNKNOWN")
         
         if execution_status == "SQL_ERROR":
             stats["errors"] += 1
+        elif execution_status == "TIMEOUT":
+            stats["timeouts"] += 1
         elif match_type in ["EXACT_MATCH", "STRICT_EXACT_MATCH", "SOFT_MATCH", "SUPER_SOFT_MATCH"]:
             stats["success"] += 1
             if match_type == "EXACT_MATCH": stats["exact_match"] += 1
@@ -117,12 +158,18 @@ def main():
         else:
             stats["wrong"] += 1
             
-        results_detail.append(eval_result)
+        stats["ves_sum"] += eval_result.get("ves") or 0.0
+        results_detail[position] = eval_result
 
     if stats["total"] > 0:
         stats["accuracy"] = (stats["success"] / stats["total"]) * 100
     else:
         stats["accuracy"] = 0
+    evaluator.close()
+
+    if args.efficiency_runs and stats["total"] > 0:
+        # BIRD VES: every question counts, missing or wrong ones with a reward of 0.
+        stats["ves"] = 100 * stats["ves_sum"] / stats["total"]
 
     output_dir = os.path.dirname(args.output)
     if output_dir:
@@ -144,7 +191,10 @@ def main():
     print(f"  - Soft:      {stats['soft_match']}")
     print(f"  - Super Soft:{stats['super_soft_match']}")
     print(f"Errors:        {stats['errors']}")
+    print(f"Timeouts:      {stats['timeouts']}")
     print(f"Missing Preds: {stats['missing']}")
+    if "ves" in stats:
+        print(f"VES:           {stats['ves']:.2f}")
     print("="*40)
     print(f"Detailed report saved to: {args.output}")
 
@@ -6,6 +6,7 @@ import argparse
 import pandas as pd
 from tqdm import tqdm
 from bird_evaluator import BirdEvaluator
+from bird_db_reader import scaled_filename
 
 def load_ground_truth(dev_path, append_path):
     if not os.path.exists(dev_path) or not os.path.exists(append_path):
@@ -36,8 +37,23 @@ def main():
     parser.add_argument("--pred_file", type=str, default="baselines/din_sql/results.json")
     parser.add_argument("--dev_path", type=str, default="data/dev_20240627/dev.json")
     parser.add_argument("--append_path", type=str, default="data/dev_20240627/dev_tied_append.json")
-    parser.add_argument("--db_path", type=str, default="data/dev_20240627/dev_databases/financial/financial.sqlite")
+    parser.add_argument("--db_path", type=str, default="financial.sqlite")
     parser.add_argument("--output", type=str, default="results/din_sql_final_report.json")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall-clock budget (seconds) per predicted query")
+    parser.add_argument("--max_vm_steps", type=int, default=None, help="SQLite VM-step budget per predicted query")
+    parser.add_argument("--workers", type=int, default=1, help="Parallel evaluation workers")
+    parser.add_argument("--processes", action="store_true", help="Use worker processes instead of threads")
+    parser.add_argument("--accelerated", action="store_true", help="Read from the indexed copy built by build_accelerated_db.py")
+    parser.add_argument("--db_mode", type=str, default="file", choices=["file", "memory", "mmap"],
+                        help="Serve queries from the file, an in-memory copy or a memory-mapped file")
+    parser.add_argument("--memory_limit_mb", type=int, default=2048, help="Largest database copied into memory")
+    parser.add_argument("--efficiency_runs", type=int, default=0,
+                        help="Re-run matching predictions and their GT this many times to compute VES (0: off)")
+    parser.add_argument("--isolated_workers", type=int, default=0,
+                        help="Run predicted SQL in this many memory-capped worker processes (0: in-process)")
+    parser.add_argument("--worker_memory_mb", type=int, default=1024, help="Memory cap of each SQL worker process")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Evaluate on the <db>_x<scale>.sqlite copy built by scale_financial_db.py (1: the original)")
     args = parser.parse_args()
 
     if not os.path.exists(args.pred_file):
@@ -51,7 +67,17 @@ def main():
     print(f"Total question: {len(gt_df)}")
     print(f"Model answered: {len(predictions_dict)}")
 
-    evaluator = BirdEvaluator(db_filename=args.db_path)
+    evaluator = BirdEvaluator(
+        db_filename=scaled_filename(args.db_path, args.scale),
+        timeout_seconds=args.timeout,
+        max_vm_steps=args.max_vm_steps,
+        prefer_accelerated=args.accelerated,
+        db_mode=args.db_mode,
+        memory_limit_mb=args.memory_limit_mb,
+        efficiency_runs=args.efficiency_runs,
+        isolated_workers=args.isolated_workers,
+        worker_memory_limit_mb=args.worker_memory_mb
+    )
 
     stats = {
         "total": 0,
@@ -61,13 +87,16 @@ def main():
         "soft_match": 0,
         "super_soft_match": 0,
         "wrong": 0,
+        "timeouts": 0,
         "errors": 0,
-        "missing_prediction": 0
+        "missing_prediction": 0,
+        "ves_sum": 0.0
     }
     
     results = []
+    jobs = []
 
-    for idx, row in tqdm(gt_df.iterrows(), total=len(gt_df), desc="Evaluating DIN-SQL"):
+    for idx, row in gt_df.iterrows():
         stats["total"] += 1
         
         question_id = row.get('question_id', idx)
@@ -88,13 +117,31 @@ def main():
         raw_pred = predictions_dict[str_idx]
         pred_sql = parse_prediction_string(raw_pred)
 
-        eval_res = evaluator.evaluate_query(
-            query_id=question_id,
-            natural_language_query=query,
-            gt_sql=gt_sql,
-            pred_sql=pred_sql
-        )
-        
+        entry = {
+            "index": idx,
+            "question": query,
+            "gt_sql": gt_sql,
+            "pred_sql": pred_sql, 
+            "raw_pred": raw_pred, 
+            "eval_result": None
+        }
+        results.append(entry)
+        jobs.append((entry, {
+            "query_id": question_id,
+            "natural_language_query": query,
+            "gt_sql": gt_sql,
+            "pred_sql": pred_sql
+        }))
+
+    eval_results = evaluator.evaluate_many(
+        [item for _, item in jobs],
+        workers=args.workers,
+        use_processes=args.processes
+    )
+
+    for (entry, _), eval_res in tqdm(zip(jobs, eval_results), total=len(jobs), desc="Evaluating DIN-SQL"):
+        entry["eval_result"] = eval_res
+        stats["ves_sum"] += eval_res.get("ves") or 0.0
         match_type = eval_res.get("match_type")
         
         if match_type == "EXACT_MATCH":
@@ -111,17 +158,16 @@ def main():
             stats["success"] += 1
         elif match_type == "SQL_ERROR":
             stats["errors"] += 1
+        elif eval_res.get("execution_status") == "TIMEOUT":
+            stats["timeouts"] += 1
         else:
             stats["wrong"] += 1
 
-        results.append({
-            "index": idx,
-            "question": query,
-            "gt_sql": gt_sql,
-            "pred_sql": pred_sql, 
-            "raw_pred": raw_pred, 
-            "eval_result": eval_res
-        })
+    evaluator.close()
+
+    if args.efficiency_runs and stats["total"] > 0:
+        # BIRD VES: every question counts, missing or wrong ones with a reward of 0.
+        stats["ves"] = 100 * stats["ves_sum"] / stats["total"]
 
     os.makedirs(os.path.dirname(args.output), exist_ok=True)
     with open(args.output, 'w', encoding='utf-8') as f:
@@ -138,7 +184,10 @@ def main():
     print(f"Success:   {stats['success']}")
     print(f"Wrong:     {stats['wrong']}")
     print(f"Error:       {stats['errors']}")
+    print(f"Timeout:     {stats['timeouts']}")
     print(f"Missing:      {stats['missing_prediction']}")
+    if "ves" in stats:
+        print(f"VES:         {stats['ves']:.2f}")
     
 if __name__ == "__main__":
     main()
\ No newline at end of file
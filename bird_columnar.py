@@ -0,0 +1,352 @@
+import numpy as np
+import pandas as pd
+
+_NONE_TYPE = type(None)
+
+# Column kinds, inferred from the SQLite storage classes found in a column.
+KIND_NULL = "null"        # every value is NULL
+KIND_INTEGER = "integer"  # int64 values + NULL mask
+KIND_REAL = "real"        # float64 values + NULL mask
+KIND_TEXT = "text"        # dictionary-encoded str (or bytes): int32 codes, -1 for NULL
+KIND_MIXED = "mixed"      # several storage classes: object array
+
+
+def normalize_value(item):
+    return str(item).strip().lower() if item is not None else "none"
+
+
+def pandas_dtype(value_types):
+    """
+    The dtype pd.DataFrame.from_records(coerce_float=True) infers for a column holding values of
+    these Python types (NoneType for NULL): "int64", "float64" (numbers with a NULL or a REAL among
+    them, NULLs becoming NaN) or "object" (values kept as they are).
+    """
+    types = set(value_types) - {_NONE_TYPE}
+    if not types or not types <= {int, float}:
+        return "object"
+    if types == {int} and _NONE_TYPE not in value_types:
+        return "int64"
+    return "float64"
+
+
+def float_columns(column_types):
+    """
+    Which columns render as floats in the .values of such a frame (what pd.read_sql_query(...).values
+    produced): every float64 column, and the int64 ones too when no column is object, since the
+    frame's common dtype is then float64.
+    """
+    dtypes = [pandas_dtype(types) for types in column_types]
+    upcast = "object" not in dtypes and "float64" in dtypes
+    return [dtype == "float64" or (upcast and dtype == "int64") for dtype in dtypes]
+
+
+class Column:
+    def __init__(self, kind, length, values=None, mask=None, codes=None, dictionary=None):
+        """
+        One result column. Numeric kinds keep a NumPy array plus an optional NULL mask;
+        TEXT keeps int32 codes into a dictionary of distinct values; MIXED keeps an object array.
+        """
+        self.kind = kind
+        self.length = length
+        self.values = values
+        self.mask = mask
+        self.codes = codes
+        self.dictionary = dictionary
+
+    @classmethod
+    def from_values(cls, values):
+        kinds = set(map(type, values))
+        has_null = _NONE_TYPE in kinds
+        kinds.discard(_NONE_TYPE)
+        length = len(values)
+
+        if not kinds:
+            return cls(KIND_NULL, length)
+
+        if kinds == {int} or kinds == {float}:
+            dtype = np.int64 if kinds == {int} else np.float64
+            mask = None
+            if has_null:
+                mask = np.fromiter((v is None for v in values), dtype=bool, count=length)
+                array = np.array([0 if v is None else v for v in values], dtype=dtype)
+            else:
+                array = np.array(values, dtype=dtype)
+            return cls(KIND_INTEGER if dtype is np.int64 else KIND_REAL, length, values=array, mask=mask)
+
+        if len(kinds) == 1:
+            objects = np.empty(length, dtype=object)
+            objects[:] = values
+            codes, dictionary = pd.factorize(objects)
+            return cls(KIND_TEXT, length, codes=codes.astype(np.int32), dictionary=np.asarray(dictionary, dtype=object))
+
+        objects = np.empty(length, dtype=object)
+        objects[:] = values
+        return cls(KIND_MIXED, length, values=objects)
+
+    @classmethod
+    def concat(cls, columns):
+        """
+        Joins the chunks of one column (e.g. one per fetched batch). TEXT dictionaries are merged;
+        all-NULL chunks take the kind of the others; chunks of different kinds become MIXED.
+        """
+        columns = [c for c in columns if c.length]
+        if not columns:
+            return cls(KIND_NULL, 0)
+        if len(columns) == 1:
+            return columns[0]
+
+        length = sum(c.length for c in columns)
+        kinds = {c.kind for c in columns} - {KIND_NULL}
+        if not kinds:
+            return cls(KIND_NULL, length)
+        if len(kinds) > 1 or KIND_MIXED in kinds:
+            objects = np.empty(length, dtype=object)
+            objects[:] = [v for c in columns for v in c.to_list()]
+            return cls(KIND_MIXED, length, values=objects)
+
+        kind = kinds.pop()
+        if kind == KIND_TEXT:
+            dictionaries = [c.dictionary for c in columns if c.kind == KIND_TEXT]
+            merged_codes, dictionary = pd.factorize(np.concatenate(dictionaries))
+            chunks, offset = [], 0
+            for c in columns:
+                if c.kind == KIND_NULL:
+                    chunks.append(np.full(c.length, -1, dtype=np.int32))
+                    continue
+                remap = np.append(merged_codes[offset:offset + len(c.dictionary)], -1).astype(np.int32)
+                chunks.append(remap[c.codes])
+                offset += len(c.dictionary)
+            return cls(KIND_TEXT, length, codes=np.concatenate(chunks), dictionary=np.asarray(dictionary, dtype=object))
+
+        dtype = np.int64 if kind == KIND_INTEGER else np.float64
+        values = np.concatenate([
+            np.zeros(c.length, dtype=dtype) if c.kind == KIND_NULL else c.values for c in columns
+        ])
+        mask = None
+        if any(c.kind == KIND_NULL or c.mask is not None for c in columns):
+            mask = np.concatenate([
+                np.ones(c.length, dtype=bool) if c.kind == KIND_NULL
+                else (c.mask if c.mask is not None else np.zeros(c.length, dtype=bool))
+                for c in columns
+            ])
+        return cls(kind, length, values=values, mask=mask)
+
+    def __len__(self):
+        return self.length
+
+    @property
+    def null_mask(self):
+        if self.kind == KIND_NULL:
+            return np.ones(self.length, dtype=bool)
+        if self.kind == KIND_TEXT:
+            return self.codes < 0
+        if self.kind == KIND_MIXED:
+            return np.fromiter((v is None for v in self.values), dtype=bool, count=self.length)
+        return self.mask if self.mask is not None else np.zeros(self.length, dtype=bool)
+
+    def value_types(self):
+        """
+        The Python types of the column's values, NoneType included when it holds a NULL.
+        """
+        if self.kind == KIND_NULL:
+            return {_NONE_TYPE} if self.length else set()
+        if self.kind == KIND_MIXED:
+            return set(map(type, self.values.tolist()))
+        if self.kind == KIND_TEXT:
+            types = set(map(type, self.dictionary.tolist()))
+        else:
+            types = {int} if self.kind == KIND_INTEGER else {float}
+        if self.null_mask.any():
+            types.add(_NONE_TYPE)
+        return types
+
+    def to_list(self):
+        """
+        The column as Python values, exactly as sqlite3 returned them.
+        """
+        if self.kind == KIND_NULL:
+            return [None] * self.length
+        if self.kind == KIND_TEXT:
+            lookup = np.append(self.dictionary, None)
+            return lookup[self.codes].tolist()
+        values = self.values.tolist()
+        if self.mask is not None:
+            for idx in np.flatnonzero(self.mask).tolist():
+                values[idx] = None
+        return values
+
+    def normalized(self, intern_table=None, as_float=False):
+        """
+        normalize_value applied to every cell, converting each distinct value to a string only once.
+        NULLs become "none" through the -1 code, which indexes the trailing "none" entry.
+        as_float renders a numeric column as pandas' float64 does: every number as a float ("3.0")
+        and NULL as "nan".
+        """
+        if as_float:
+            return self._normalized_float()
+        if self.kind == KIND_NULL:
+            return ["none"] * self.length
+        if self.kind == KIND_MIXED:
+            return [normalize_value(v) for v in self.values.tolist()]
+
+        if self.kind == KIND_TEXT:
+            codes = self.codes
+            normalized = list(map(normalize_value, self.dictionary.tolist()))
+            if intern_table is not None:
+                # Identical strings share one object per column across batches.
+                normalized = [intern_table.setdefault(n, n) for n in normalized]
+        elif self.kind == KIND_INTEGER:
+            codes, uniques = pd.factorize(self.values)
+            # numpy renders int64 exactly like str(int), so the uniques convert in one call.
+            normalized = uniques.astype(np.str_).tolist()
+        else:
+            # Factorize on the IEEE bit pattern so -0.0 and 0.0 stay distinct, as str() keeps them.
+            codes, unique_bits = pd.factorize(self.values.view(np.int64))
+            normalized = [str(u).lower() for u in unique_bits.astype(np.int64).view(np.float64).tolist()]
+
+        if self.mask is not None:
+            codes = codes.copy()
+            codes[self.mask] = -1
+        lookup = np.array(normalized + ["none"], dtype=object)
+        return lookup[codes].tolist()
+
+    def _normalized_float(self):
+        if self.kind == KIND_NULL:
+            # A part of a streamed column that is NULL so far
+            return ["nan"] * self.length
+        if self.kind == KIND_MIXED:
+            values = np.array([0.0 if v is None else float(v) for v in self.values.tolist()], dtype=np.float64)
+        else:
+            values = self.values.astype(np.float64, copy=False)
+        codes, unique_bits = pd.factorize(values.view(np.int64))
+        normalized = [str(u).lower() for u in unique_bits.astype(np.int64).view(np.float64).tolist()]
+        null_mask = self.null_mask
+        if null_mask.any():
+            codes = codes.copy()
+            codes[null_mask] = -1
+        lookup = np.array(normalized + ["nan"], dtype=object)
+        return lookup[codes].tolist()
+
+    def to_pandas(self):
+        if self.kind == KIND_TEXT:
+            if isinstance(self.dictionary[:1].tolist()[0] if len(self.dictionary) else "", str):
+                return pd.Series(pd.Categorical.from_codes(self.codes, categories=self.dictionary))
+            return pd.Series(self.to_list(), dtype=object)
+        if self.kind == KIND_INTEGER:
+            mask = self.mask if self.mask is not None else np.zeros(self.length, dtype=bool)
+            return pd.Series(pd.arrays.IntegerArray(self.values, mask))
+        if self.kind == KIND_REAL:
+            values = self.values.copy()
+            if self.mask is not None:
+                values[self.mask] = np.nan
+            return pd.Series(values)
+        return pd.Series(self.to_list(), dtype=object)
+
+    def summary(self):
+        """
+        Per-column aggregates computed on the arrays: NULL count, distinct count, and
+        min / max / mean for numeric columns or the most frequent value for TEXT.
+        """
+        null_mask = self.null_mask
+        info = {"kind": self.kind, "rows": self.length, "nulls": int(null_mask.sum())}
+        if self.kind in (KIND_INTEGER, KIND_REAL):
+            present = self.values[~null_mask]
+            info["distinct"] = int(len(pd.unique(present)))
+            if len(present):
+                info["min"] = present.min().item()
+                info["max"] = present.max().item()
+                info["mean"] = float(present.mean())
+        elif self.kind == KIND_TEXT:
+            info["distinct"] = len(self.dictionary)
+            present = self.codes[self.codes >= 0]
+            if len(present):
+                counts = np.bincount(present, minlength=len(self.dictionary))
+                top = int(counts.argmax())
+                info["top"] = self.dictionary[top]
+                info["top_count"] = int(counts[top])
+        elif self.kind == KIND_MIXED:
+            info["distinct"] = len(set(v for v in self.values.tolist() if v is not None))
+        else:
+            info["distinct"] = 0
+        return info
+
+
+class ColumnarResult:
+    def __init__(self, column_names, columns):
+        """
+        A query result stored column by column (see Column) instead of as row tuples.
+        """
+        self.column_names = list(column_names)
+        self.columns = columns
+        self.row_count = columns[0].length if columns else 0
+
+    @classmethod
+    def from_rows(cls, column_names, rows):
+        if not rows:
+            return cls(column_names, [Column(KIND_NULL, 0) for _ in column_names])
+        return cls(column_names, [Column.from_values(values) for values in zip(*rows)])
+
+    @classmethod
+    def from_batches(cls, column_names, batches):
+        """
+        Encodes each fetched batch as it arrives and merges the chunks, so the raw row tuples of
+        only one batch are alive at a time.
+        """
+        return cls.concat(column_names, [cls.from_rows(column_names, batch) for batch in batches])
+
+    @classmethod
+    def concat(cls, column_names, results):
+        """
+        Joins results of the same query fetched in parts, column by column (see Column.concat).
+        """
+        if not results:
+            return cls.from_rows(column_names, [])
+        return cls(column_names, [Column.concat(list(parts)) for parts in zip(*(r.columns for r in results))])
+
+    def __len__(self):
+        return self.row_count
+
+    def column(self, key):
+        """
+        Column by position or (first matching) name.
+        """
+        if isinstance(key, int):
+            return self.columns[key]
+        return self.columns[self.column_names.index(key)]
+
+    def rows(self):
+        if not self.columns:
+            return []
+        return list(zip(*(column.to_list() for column in self.columns)))
+
+    def value_types(self):
+        return [column.value_types() for column in self.columns]
+
+    def normalized_rows(self, intern_tables=None, typed=False, float_plan=None):
+        """
+        Rows as tuples of normalize_value strings, rendered like the cells of pd.read_sql_query(...).values:
+        numbers of the columns picked by float_columns render as floats and their NULLs as "nan".
+        float_plan overrides that choice (e.g. one made over every part of a streamed result).
+        typed=True renders each cell by its own SQLite type instead ("3", NULL as "none").
+        """
+        if not self.row_count:
+            return []
+        if intern_tables is None:
+            intern_tables = {}
+        if typed:
+            float_plan = [False] * len(self.columns)
+        elif float_plan is None:
+            float_plan = float_columns(self.value_types())
+        return list(zip(*(
+            column.normalized(intern_tables.setdefault(idx, {}), as_float)
+            for idx, (column, as_float) in enumerate(zip(self.columns, float_plan))
+        )))
+
+    def to_pandas(self):
+        df = pd.DataFrame({idx: column.to_pandas() for idx, column in enumerate(self.columns)})
+        # Positional keys first, so duplicate column names (e.g. two "name" columns) both survive.
+        df.columns = self.column_names
+        return df
+
+    def summary(self):
+        return [{"column": name, **column.summary()} for name, column in zip(self.column_names, self.columns)]
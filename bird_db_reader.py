@@ -1,53 +1,306 @@
 import sqlite3
 import pandas as pd
 import os
+import itertools
+import re
+import queue
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from bird_db_registry import get_registry
+from bird_result_cache import database_fingerprint
+from bird_columnar import ColumnarResult
+
+ACCELERATED_SUFFIX = "_accel"
+
+
+def accelerated_path(db_path):
+    """
+    Path of the accelerated copy built by build_accelerated_db.py: <stem>_accel.sqlite next to the source.
+    """
+    stem, ext = os.path.splitext(db_path)
+    return f"{stem}{ACCELERATED_SUFFIX}{ext}"
+
+
+def source_stamp(db_path):
+    """
+    31-bit stamp of a source database, stored as PRAGMA user_version in its accelerated copy.
+    """
+    # user_version is a signed 32-bit integer, so the top bit is dropped to keep the stamp positive.
+    return int(database_fingerprint(db_path)[:8], 16) & 0x7FFFFFFF
+
+
+def find_accelerated_copy(db_path):
+    """
+    Returns the accelerated copy of db_path if it exists and was built from the current source file.
+    """
+    accel_path = accelerated_path(db_path)
+    if not os.path.exists(accel_path):
+        return None
+    conn = sqlite3.connect(f"file:{os.path.abspath(accel_path)}?mode=ro", uri=True)
+    try:
+        stamp = conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+    if stamp != source_stamp(db_path):
+        print(f"Accelerated copy is stale, using the source database: {accel_path}")
+        return None
+    return accel_path
+
+
+SCALED_PATTERN = re.compile(r"_x(\d+)$")
+
+
+def scaled_filename(db_filename, scale):
+    """
+    Name of the scale-factor copy written by scale_financial_db.py: <stem>_x<scale>.sqlite.
+    A scale of 1 (or None) is the database itself.
+    """
+    if not scale or scale == 1:
+        return db_filename
+    stem, ext = os.path.splitext(db_filename)
+    return f"{stem}_x{scale}{ext}"
+
+
+def base_db_id(db_path):
+    """
+    BIRD db_id of a database file, with the _x<scale> suffix of a scaled copy removed.
+    """
+    stem = os.path.splitext(os.path.basename(db_path))[0]
+    return SCALED_PATTERN.sub("", stem)
+
+
+DB_MODES = ("file", "memory", "mmap")
+
+# One in-memory copy per database file and process, kept alive by its anchor connection
+# while at least one reader uses it: key -> [uri, anchor, reader count].
+_memory_databases = {}
+_memory_lock = threading.Lock()
+_memory_names = itertools.count()
+
+
+def _memory_copy_uri(db_path):
+    """
+    Copies db_path into an in-memory database with the backup API (once per process and file
+    version) and returns (key, uri), the key to release it with and the URI that opens it.
+    SQLite >= 3.36 uses the memdb VFS, whose connections read the same buffer concurrently;
+    older versions fall back to a shared-cache memory database.
+    """
+    db_path = os.path.abspath(db_path)
+    stat = os.stat(db_path)
+    key = (db_path, stat.st_size, stat.st_mtime_ns)
+    with _memory_lock:
+        entry = _memory_databases.get(key)
+        if entry is None:
+            name = f"bird_{os.getpid()}_{next(_memory_names)}"
+            if sqlite3.sqlite_version_info >= (3, 36, 0):
+                uri = f"file:/{name}?vfs=memdb"
+            else:
+                uri = f"file:{name}?mode=memory&cache=shared"
+            anchor = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            source = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+            try:
+                source.backup(anchor)
+            except (sqlite3.Error, MemoryError):
+                anchor.close()
+                raise
+            finally:
+                source.close()
+            entry = _memory_databases[key] = [uri, anchor, 0]
+        entry[2] += 1
+        return key, entry[0]
+
+
+def _release_memory_copy(key):
+    """
+    Drops one reader's hold on an in-memory copy; the last one closes the anchor connection,
+    and SQLite frees the copy once its remaining connections are closed.
+    """
+    with _memory_lock:
+        entry = _memory_databases.get(key)
+        if entry is None:
+            return
+        entry[2] -= 1
+        if entry[2] <= 0:
+            del _memory_databases[key]
+            entry[1].close()
+
+
+_READ_ACTIONS = {sqlite3.SQLITE_SELECT, sqlite3.SQLITE_READ, sqlite3.SQLITE_FUNCTION, sqlite3.SQLITE_RECURSIVE}
+# Pragmas whose argument names a schema object to describe rather than a new setting.
+_INTROSPECTION_PRAGMAS = {
+    "table_info", "table_xinfo", "index_list", "index_info", "index_xinfo",
+    "foreign_key_list", "foreign_key_check", "integrity_check", "quick_check"
+}
+
+
+def _read_only_authorizer(action, arg1, arg2, db_name, trigger):
+    """
+    Authorizer of reader connections: reads, functions and pragma queries are allowed, every
+    write, ATTACH, schema change and pragma assignment (e.g. "PRAGMA query_only = OFF") is denied
+    when the statement is prepared.
+    """
+    if action in _READ_ACTIONS:
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_PRAGMA and (arg2 is None or arg1.lower() in _INTROSPECTION_PRAGMAS):
+        return sqlite3.SQLITE_OK
+    if action == sqlite3.SQLITE_UPDATE and arg1 in ("sqlite_master", "sqlite_temp_master"):
+        # Reported when a pragma table function such as pragma_table_info() loads the schema;
+        # sqlite_master itself can only be written with writable_schema, a denied assignment.
+        return sqlite3.SQLITE_OK
+    return sqlite3.SQLITE_DENY
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query exceeds its wall-clock or VM-step budget and is interrupted."""
+
 
 class BirdDBReader:
-    def __init__(self, db_filename='financial.sqlite'):
+    def __init__(self, db_filename='financial.sqlite', pool_size=None, cached_statements=256,
+                 prefer_accelerated=False, db_mode="file", memory_limit_mb=2048, cache_size_mb=256):
         """
-        Initializes the database path.
-        The connection is not established immediately; it opens when entering the 'with' block.
+        Initializes the database path and an empty pool of read-only connections.
+        Connections are opened lazily, checked out per query and reused afterwards,
+        so the SQLite page cache survives between queries.
+        The pool keeps up to pool_size idle connections (default: one per CPU core).
+        With prefer_accelerated=True, queries go to an up-to-date accelerated copy when one exists.
+
+        db_mode selects where pages are read from:
+          "file"   - the database file, opened read-only (default)
+          "memory" - an in-memory copy made once per process; files above memory_limit_mb
+                     (or a copy that fails) fall back to "mmap"
+          "mmap"   - the file, memory-mapped in full
+        The "memory" and "mmap" connections also get a cache_size_mb page cache and temp_store=MEMORY.
         """
-        self.db_path = self._find_database(db_filename)
-        self.conn = None
-        
+        if db_mode not in DB_MODES:
+            raise ValueError(f"Unknown db_mode '{db_mode}', expected one of {DB_MODES}")
+        self.source_db_path = self._find_database(db_filename)
+        self.db_path = self.source_db_path
+        if prefer_accelerated:
+            self.db_path = find_accelerated_copy(self.source_db_path) or self.source_db_path
+        self.db_mode = db_mode
+        self.memory_limit_mb = memory_limit_mb
+        self.cache_size_mb = cache_size_mb
+        self._uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        self._memory_key = None
+        if db_mode == "memory":
+            self._load_into_memory()
+        self.pool_size = pool_size or os.cpu_count() or 4
+        self.cached_statements = cached_statements
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self._local = threading.local()
+        self._closed = False
+
     def _find_database(self, filename):
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-
-        candidate_path = os.path.join(base_dir, filename)
-        if os.path.exists(candidate_path):
-            return candidate_path
-    
-        for root, dirs, files in os.walk(base_dir):
-            if filename in files:
-                found_path = os.path.join(root, filename)
-                print(f"File: {found_path}")
-                return found_path
-        
-        raise FileNotFoundError("SQL FILE NOT FOUND")
+        return get_registry().resolve(filename)
+
+    def _load_into_memory(self):
+        size_mb = os.path.getsize(self.db_path) / (1024 * 1024)
+        if size_mb > self.memory_limit_mb:
+            print(f"Database is {size_mb:.0f} MB, above the {self.memory_limit_mb} MB memory limit; using mmap mode.")
+            self.db_mode = "mmap"
+            return
+        try:
+            self._memory_key, self._uri = _memory_copy_uri(self.db_path)
+        except (sqlite3.Error, MemoryError) as e:
+            print(f"In-memory copy failed ({e}); using mmap mode.")
+            self.db_mode = "mmap"
+
+    def _open_connection(self):
+        # The 'uri=True' parameter and '?mode=ro' query string are critical here.
+        # This prevents any write attempts at the OS level.
+        # In-memory copies cannot be opened with mode=ro, so they are locked with query_only and an
+        # authorizer: a predicted "PRAGMA query_only = OFF" must not make the shared copy writable.
+        # check_same_thread=False lets a pooled connection be reused by whichever
+        # thread checks it out next; the pool guarantees one user at a time.
+        conn = sqlite3.connect(
+            self._uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        if self.db_mode != "file":
+            conn.execute("PRAGMA query_only = ON")
+            conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_mb * 1024)}")
+            conn.execute("PRAGMA temp_store = MEMORY")
+            conn.execute(f"PRAGMA mmap_size = {os.path.getsize(self.db_path)}")
+        conn.set_authorizer(_read_only_authorizer)
+        return conn
+
+    def acquire(self):
+        """
+        Checks out a read-only connection from the pool, opening a new one if the pool is empty.
+        """
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            try:
+                return self._open_connection()
+            except sqlite3.Error as e:
+                print(f"Connection error: {e}")
+                raise
+
+    def release(self, conn):
+        """
+        Returns a connection to the pool. Surplus connections (or any after close()) are closed.
+        """
+        if conn is None:
+            return
+        if self._closed:
+            conn.close()
+            return
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """
+        Thread-safe checkout of a pooled connection for the duration of the 'with' block.
+        """
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        """
+        Closes every idle pooled connection. Connections still checked out are closed on release.
+        An in-memory copy is freed once no reader uses it anymore.
+        """
+        self._closed = True
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._memory_key:
+            _release_memory_copy(self._memory_key)
+            self._memory_key = None
+
+    @property
+    def conn(self):
+        return getattr(self._local, "conn", None)
 
     def __enter__(self):
         """
         Context Manager Entry.
-        Opens the database connection in READ-ONLY mode.
+        Checks out a pooled READ-ONLY connection for the current thread.
         """
-        try:
-            # The 'uri=True' parameter and '?mode=ro' query string are critical here.
-            # This prevents any write attempts at the OS level.
-            uri_path = f"file:{os.path.abspath(self.db_path)}?mode=ro"
-            self.conn = sqlite3.connect(uri_path, uri=True)
-            return self
-        except sqlite3.Error as e:
-            print(f"Connection error: {e}")
-            raise
+        self._local.conn = self.acquire()
+        return self
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         """
         Context Manager Exit.
-        Safely closes the connection whether an error occurred or not.
+        Returns the connection to the pool whether an error occurred or not.
         """
-        if self.conn:
-            self.conn.close()
+        conn = self.conn
+        self._local.conn = None
+        self.release(conn)
 
     def run_select_query(self, sql_query):
         """
@@ -55,9 +308,214 @@ class BirdDBReader:
         """
         if not self.conn:
             raise ConnectionError("Connection is not open. Please use the 'with' block.")
-        
+
         try:
             return pd.read_sql_query(sql_query, self.conn)
         except Exception as e:
             print(f"Query error: {e}")
-            return None
\ No newline at end of file
+            return None
+
+    def stream_select_query(self, sql_query, batch_size=1000, include_columns=False,
+                            timeout_seconds=None, max_vm_steps=None, progress_interval=1000):
+        """
+        Executes a SELECT query and yields lists of row tuples fetched with fetchmany(batch_size).
+        With include_columns=True the first item yielded is the list of column names,
+        even when the query returns no rows. Errors are raised, not swallowed.
+        Uses the connection of the surrounding 'with' block if any, otherwise checks one out.
+
+        timeout_seconds / max_vm_steps set a budget enforced by SQLite's progress handler,
+        checked every progress_interval VM instructions; exceeding it raises QueryTimeoutError.
+        """
+        conn = self.conn
+        owned = conn is None
+        if owned:
+            conn = self.acquire()
+
+        budget = {"steps": 0, "reason": None}
+        if timeout_seconds or max_vm_steps:
+            deadline = time.monotonic() + timeout_seconds if timeout_seconds else None
+
+            def check_budget():
+                budget["steps"] += progress_interval
+                if max_vm_steps and budget["steps"] > max_vm_steps:
+                    budget["reason"] = f"Query exceeded the budget of {max_vm_steps} VM steps"
+                    return 1
+                if deadline is not None and time.monotonic() > deadline:
+                    budget["reason"] = f"Query exceeded the time budget of {timeout_seconds}s"
+                    return 1
+                return 0
+
+            conn.set_progress_handler(check_budget, progress_interval)
+
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql_query)
+            if include_columns:
+                yield [desc[0] for desc in cursor.description or []]
+
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield batch
+        except sqlite3.OperationalError as e:
+            if budget["reason"]:
+                raise QueryTimeoutError(budget["reason"]) from e
+            raise
+        finally:
+            cursor.close()
+            if timeout_seconds or max_vm_steps:
+                conn.set_progress_handler(None, 0)
+            if owned:
+                self.release(conn)
+
+    def run_columnar_query(self, sql_query, max_rows=None, batch_size=10000,
+                           timeout_seconds=None, max_vm_steps=None):
+        """
+        Executes a SELECT query and returns a ColumnarResult: one NumPy array per column
+        (int64 / float64 with a NULL mask, dictionary-encoded TEXT), built batch by batch.
+        max_rows stops fetching after that many rows (e.g. for previews). Errors are raised.
+        """
+        stream = self.stream_select_query(
+            sql_query,
+            batch_size=batch_size if max_rows is None else min(batch_size, max_rows),
+            include_columns=True,
+            timeout_seconds=timeout_seconds,
+            max_vm_steps=max_vm_steps
+        )
+        col_names = next(stream)
+
+        def limited():
+            fetched = 0
+            for batch in stream:
+                if max_rows is not None and fetched + len(batch) >= max_rows:
+                    yield batch[:max_rows - fetched]
+                    break
+                fetched += len(batch)
+                yield batch
+
+        try:
+            return ColumnarResult.from_batches(col_names, limited())
+        finally:
+            stream.close()
+
+    def probe_select_query(self, sql_query, row_cap, timeout_seconds=None, max_vm_steps=None):
+        """
+        Returns (column_names, row_count) of a SELECT without fetching its rows.
+        The count stops at row_cap, so the probe never costs more than reading row_cap rows.
+        """
+        columns_sql, count_sql = self.probe_queries(sql_query, row_cap)
+        budget = {"timeout_seconds": timeout_seconds, "max_vm_steps": max_vm_steps}
+
+        columns = next(self.stream_select_query(columns_sql, include_columns=True, **budget))
+        row_count = next(self.stream_select_query(count_sql, **budget))[0][0]
+        return columns, row_count
+
+    @staticmethod
+    def probe_queries(sql_query, row_cap):
+        """
+        The two statements behind probe_select_query: one returning no rows but the column names,
+        one counting at most row_cap rows.
+        """
+        # Newlines keep a trailing '--' comment in the query from swallowing the closing parenthesis.
+        inner_sql = sql_query.strip().rstrip(';')
+        return (f"SELECT * FROM (\n{inner_sql}\n) LIMIT 0",
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM (\n{inner_sql}\n) LIMIT {int(row_cap)})")
+
+    def explain_query_plan(self, sql_query):
+        """
+        Prepares a query under EXPLAIN QUERY PLAN without running it.
+        Returns the plan as a list of (id, parent, detail) tuples; syntax and schema errors are raised.
+        """
+        inner_sql = sql_query.strip().rstrip(';')
+        conn = self.conn
+        owned = conn is None
+        if owned:
+            conn = self.acquire()
+        try:
+            return [(row[0], row[1], row[3]) for row in conn.execute(f"EXPLAIN QUERY PLAN {inner_sql}")]
+        finally:
+            if owned:
+                self.release(conn)
+
+    def table_names(self):
+        """
+        Returns the names of the tables in the database.
+        """
+        sql = "SELECT name FROM sqlite_master WHERE type = 'table'"
+        return [row[0] for batch in self.stream_select_query(sql) for row in batch]
+
+    def table_columns(self, table):
+        """
+        Returns the column names of a table, in declaration order.
+        """
+        sql = "SELECT name FROM pragma_table_info('{}')".format(table.replace("'", "''"))
+        return [row[0] for batch in self.stream_select_query(sql) for row in batch]
+
+
+class ReaderRegistry:
+    def __init__(self, max_open=4, **reader_options):
+        """
+        LRU cache of BirdDBReader instances keyed by BIRD db_id, so one evaluator can serve
+        questions from every dev database. At most max_open readers (each with its own
+        connection pool) stay open; least recently used ones are closed when another is needed.
+        Readers checked out with use() or registered with pinned=True are never evicted.
+        reader_options are passed to every BirdDBReader.
+        """
+        self.max_open = max_open
+        self.reader_options = reader_options
+        self._readers = OrderedDict()
+        self._in_use = {}
+        self._pinned = set()
+        self._lock = threading.Lock()
+
+    def _evict(self):
+        for db_id in list(self._readers):
+            if len(self._readers) <= self.max_open:
+                break
+            if db_id in self._pinned or self._in_use.get(db_id):
+                continue
+            self._readers.pop(db_id).close()
+
+    def add(self, db_id, reader, pinned=False):
+        """
+        Registers an already open reader (e.g. the evaluator's default database).
+        """
+        with self._lock:
+            self._readers[db_id] = reader
+            if pinned:
+                self._pinned.add(db_id)
+            self._evict()
+
+    @contextmanager
+    def use(self, db_id):
+        """
+        Yields the reader of db_id, opening it (and evicting cold ones) if needed.
+        """
+        with self._lock:
+            reader = self._readers.get(db_id)
+            if reader is None:
+                reader = BirdDBReader(f"{db_id}.sqlite", **self.reader_options)
+                self._readers[db_id] = reader
+            self._readers.move_to_end(db_id)
+            self._in_use[db_id] = self._in_use.get(db_id, 0) + 1
+            self._evict()
+        try:
+            yield reader
+        finally:
+            with self._lock:
+                self._in_use[db_id] -= 1
+                if not self._in_use[db_id]:
+                    # Only readers in use have an entry, so the dict stays as small as the LRU.
+                    del self._in_use[db_id]
+                self._evict()
+
+    def open_db_ids(self):
+        with self._lock:
+            return list(self._readers)
+
+    def close(self):
+        with self._lock:
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
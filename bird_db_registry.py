@@ -0,0 +1,108 @@
+import json
+import os
+import threading
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_INDEX_PATH = os.path.join(BASE_DIR, ".cache", "db_index.json")
+SKIPPED_DIRS = {".git", ".cache", "__pycache__", "chroma_db", "database_description"}
+
+
+class DatabaseRegistry:
+    def __init__(self, root_dir=BASE_DIR, index_path=DEFAULT_INDEX_PATH):
+        """
+        Persistent filename -> path index of the SQLite databases under root_dir.
+        The tree is walked once and the index is written to disk; later lookups only
+        stat the directory of the indexed entry and rescan when it is missing or stale.
+        """
+        self.root_dir = os.path.abspath(root_dir)
+        self.index_path = index_path
+        self._lock = threading.Lock()
+        self._entries = self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return {}
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return {}
+        if data.get("root_dir") != self.root_dir:
+            return {}
+        return data.get("entries", {})
+
+    def _save_index(self):
+        os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+        tmp_path = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"root_dir": self.root_dir, "entries": self._entries}, f, indent=2)
+        os.replace(tmp_path, self.index_path)
+
+    def _is_fresh(self, entry):
+        directory = os.path.dirname(entry["path"])
+        try:
+            return os.stat(directory).st_mtime_ns == entry["dir_mtime"] and os.path.exists(entry["path"])
+        except OSError:
+            return False
+
+    def rebuild(self):
+        """
+        Walks root_dir once and records every *.sqlite file with the mtime of its directory.
+        When a filename occurs more than once, the first one in walk order wins.
+        """
+        entries = {}
+        for root, dirs, files in os.walk(self.root_dir):
+            dirs[:] = sorted(d for d in dirs if d not in SKIPPED_DIRS)
+            for filename in sorted(files):
+                if not filename.endswith(".sqlite") or filename in entries:
+                    continue
+                entries[filename] = {
+                    "path": os.path.join(root, filename),
+                    "dir_mtime": os.stat(root).st_mtime_ns
+                }
+        with self._lock:
+            self._entries = entries
+            self._save_index()
+
+    def resolve(self, filename):
+        """
+        Returns the absolute path of a database given a path or a bare filename.
+        """
+        candidate_path = os.path.join(self.root_dir, filename)
+        if os.path.exists(candidate_path):
+            return candidate_path
+
+        key = os.path.basename(filename)
+        entry = self._entries.get(key)
+        if entry and self._is_fresh(entry):
+            return entry["path"]
+
+        self.rebuild()
+        entry = self._entries.get(key)
+        if entry:
+            return entry["path"]
+
+        raise FileNotFoundError("SQL FILE NOT FOUND")
+
+    def resolve_db_id(self, db_id):
+        return self.resolve(f"{db_id}.sqlite")
+
+    def db_ids(self):
+        if not self._entries:
+            self.rebuild()
+        return sorted(os.path.splitext(name)[0] for name in self._entries)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry():
+    """
+    Process-wide registry shared by the evaluator, the vector DB builder and the runners.
+    """
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = DatabaseRegistry()
+        return _registry
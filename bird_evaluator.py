@@ -1,36 +1,346 @@
 from datetime import datetime
-from bird_db_reader import BirdDBReader 
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from contextlib import nullcontext
+import math
+import multiprocessing
+import threading
+import time
+import pandas as pd
+from bird_db_reader import BirdDBReader, ReaderRegistry, QueryTimeoutError, base_db_id
+from bird_result_cache import ResultCache, DEFAULT_CACHE_PATH, normalize_sql
+from bird_result_digest import ResultDigest
+from sql_executor_pool import SQLExecutorPool
+from bird_columnar import ColumnarResult, float_columns, normalize_value as _normalize_value
+
+MATCH_TYPES = ("EXACT_MATCH", "STRICT_EXACT_MATCH", "SOFT_MATCH", "SUPER_SOFT_MATCH")
+
+def normalize_rows(rows, intern_tables=None, typed=False):
+    """
+    Column-by-column normalization of raw SQLite rows into tuples of lowercase, stripped strings.
+    Output is identical to legacy_normalize_rows; typed=True renders each cell by its own type
+    instead (see ColumnarResult.normalized_rows).
+    """
+    if not rows:
+        return []
+    return ColumnarResult.from_rows([], rows).normalized_rows(intern_tables, typed=typed)
+
+
+def legacy_normalize_rows(rows):
+    """
+    The rendering of the original pandas path (pd.read_sql_query(...).values, pandas 2.x): the
+    whole result shares one dtype, so INTEGER columns holding NULLs render as "5.0" / "nan" and a
+    result of only INTEGER and REAL columns renders every number as a float.
+    Kept as the reference normalize_rows is checked against.
+    """
+    if not rows:
+        return []
+    # pandas 3 would infer a string dtype that turns NULL text into NaN.
+    with pd.option_context("future.infer_string", False):
+        frame = pd.DataFrame.from_records(rows, coerce_float=True)
+    return [tuple(_normalize_value(item) for item in row) for row in frame.values]
+
 
 class BirdEvaluator:
-    def __init__(self, db_filename="financial.sqlite"):
+    def __init__(self, db_filename="financial.sqlite", result_cache_path=DEFAULT_CACHE_PATH,
+                 timeout_seconds=None, max_vm_steps=None, batch_size=10000,
+                 digest_mode=False, log_digests=None, probe_predictions=False, probe_cap=100000,
+                 digest_keep_rows=100000,
+                 concurrent_execution=True, prefer_accelerated=False, db_mode="file", memory_limit_mb=2048,
+                 efficiency_runs=0, max_open_databases=4,
+                 isolated_workers=0, worker_memory_limit_mb=1024, kill_timeout_seconds=300,
+                 typed_normalization=False):
         self.db_filename = db_filename
-        self.db_reader = BirdDBReader(db_filename)
+        # prefer_accelerated reads from the indexed copy made by build_accelerated_db.py when it is current.
+        self.prefer_accelerated = prefer_accelerated
+        # db_mode="memory" serves every query from an in-memory copy made once per process.
+        self.memory_limit_mb = memory_limit_mb
+        self.db_reader = BirdDBReader(
+            db_filename,
+            prefer_accelerated=prefer_accelerated,
+            db_mode=db_mode,
+            memory_limit_mb=memory_limit_mb
+        )
+        self.result_cache_path = result_cache_path
+
+        # Questions from other BIRD databases (evaluate_query(db_id=...)) go to an LRU of
+        # readers with the same options; the default database stays pinned in it.
+        self.max_open_databases = max_open_databases
+        self.readers = ReaderRegistry(
+            max_open=max_open_databases,
+            prefer_accelerated=prefer_accelerated,
+            db_mode=db_mode,
+            memory_limit_mb=memory_limit_mb
+        )
+        self.default_db_id = base_db_id(self.db_reader.source_db_path)
+        self.readers.add(self.default_db_id, self.db_reader, pinned=True)
+
+        # Execution budget applied to predicted SQL only; ground truth always runs to completion.
+        self.timeout_seconds = timeout_seconds
+        self.max_vm_steps = max_vm_steps
+        self.batch_size = batch_size
+
+        # Digest mode streams both results into order-sensitive / multiset digests. Results of up to
+        # digest_keep_rows rows are also kept (and cached) for the match checks; larger ones are
+        # only fetched again when neither digest settles the match type.
+        self.digest_mode = digest_mode
+        self.digest_keep_rows = digest_keep_rows
+        self.log_digests = digest_mode if log_digests is None else log_digests
+
+        # Optional shape probe: predictions whose row/column counts cannot satisfy any match
+        # type are rejected before being fetched. GT shapes are memoized per normalized SQL.
+        self.probe_predictions = probe_predictions
+        self.probe_cap = probe_cap
+        self._gt_shapes = {}
+
+        # GT and predicted SQL run at the same time on separate pooled connections;
+        # sqlite3 releases the GIL while a statement executes.
+        self.concurrent_execution = concurrent_execution
+        self._pair_executor = None
+        self._pair_executor_lock = threading.Lock()
+
+        # With isolated_workers > 0, predicted SQL runs in a pool of memory-capped worker processes
+        # that are hard-killed on timeout; a runaway query then fails alone instead of the whole run.
+        self.isolated_workers = isolated_workers
+        self.worker_memory_limit_mb = worker_memory_limit_mb
+        self.kill_timeout_seconds = kill_timeout_seconds
+        self.executor_pool = SQLExecutorPool(
+            workers=isolated_workers,
+            memory_limit_mb=worker_memory_limit_mb,
+            kill_timeout_seconds=kill_timeout_seconds
+        ) if isolated_workers else None
+
+        # Efficiency mode (BIRD VES): matching predictions and their GT are re-run efficiency_runs
+        # times each; 0 disables it and keeps 'ves'/'timing' out of the result log.
+        self.efficiency_runs = efficiency_runs
+
+        # Results render like the original pandas path by default (see normalize_rows);
+        # typed_normalization opts in to rendering each cell by its own SQLite type.
+        self.typed_normalization = typed_normalization
+
+        # Normalized result sets are cached on disk per database fingerprint; None disables it.
+        self.result_cache = ResultCache(result_cache_path) if result_cache_path else None
+        self.db_fingerprint = self.result_cache.register_database(self.db_reader.db_path) if self.result_cache else None
+        self._fingerprints = {self.db_reader.db_path: self.db_fingerprint}
+        self._fingerprints_lock = threading.Lock()
         
-    def _execute_sql(self, sql):
+    def _prediction_budget(self, timeout_seconds=None, max_vm_steps=None):
+        """
+        Execution budget for a predicted query: the per-call values when given, else the evaluator's.
+        """
+        return {
+            "timeout_seconds": self.timeout_seconds if timeout_seconds is None else timeout_seconds,
+            "max_vm_steps": self.max_vm_steps if max_vm_steps is None else max_vm_steps
+        }
+
+    def _fingerprint(self, reader):
+        """
+        Result-cache fingerprint of a reader's database, registered on first use.
+        """
+        with self._fingerprints_lock:
+            if reader.db_path not in self._fingerprints:
+                self._fingerprints[reader.db_path] = self.result_cache.register_database(reader.db_path)
+            return self._fingerprints[reader.db_path]
+
+    def _stream_rows(self, sql, budget=None, reader=None):
+        """
+        Returns (column_names, iterator of raw row batches) for a query.
+        budget is a _prediction_budget() dict; None runs the query without limits.
+        reader defaults to the evaluator's own database.
+        """
+        reader = reader or self.db_reader
+        if budget is not None and self.executor_pool:
+            stream = self.executor_pool.stream(reader.db_path, sql, batch_size=self.batch_size, **budget)
+        else:
+            stream = reader.stream_select_query(
+                sql,
+                batch_size=self.batch_size,
+                include_columns=True,
+                **(budget or {})
+            )
+        col_names = [str(col).strip().lower() for col in next(stream)]
+        return col_names, stream
+
+    def _cache_variant(self, budget=None):
+        """
+        Result-cache key variant. A prediction's result depends on the budget it ran under (and on the
+        worker memory cap), so a run with a tighter --timeout / --max_vm_steps never reuses a success
+        recorded under a looser one; unlimited runs, including all GT queries, share the entry without a budget.
+        The rendering comes first, so entries written before it was part of the key are never reused.
+        """
+        parts = ["render=typed" if self.typed_normalization else "render=frame"]
+        if budget is not None:
+            if budget.get("timeout_seconds") is not None:
+                parts.append(f"timeout={budget['timeout_seconds']}")
+            if budget.get("max_vm_steps") is not None:
+                parts.append(f"vm_steps={budget['max_vm_steps']}")
+            if self.executor_pool:
+                parts.append(f"worker_mb={self.worker_memory_limit_mb}")
+        return ";".join(parts)
+
+    def _execute_sql(self, sql, budget=None, reader=None):
+        reader = reader or self.db_reader
+        if self.result_cache:
+            cached = self.result_cache.get(self._fingerprint(reader), sql, self._cache_variant(budget))
+            if cached is not None:
+                rows, col_names = cached
+                return rows, col_names, None
+
         try:
-            with self.db_reader as db:
-                df = db.run_select_query(sql)
-                
-                if df is None:
-                    return None, [], "Query returned None"
-                
-                col_names = [str(col).strip().lower() for col in df.columns]
-                
-                normalized_rows = []
-                for row in df.values:
-                    norm_row = [str(item).strip().lower() if item is not None else "none" for item in row]
-                    normalized_rows.append(norm_row)
-                
-                return normalized_rows, col_names, None
+            col_names, batches = self._stream_rows(sql, budget, reader)
+            # pandas typed each column over the whole result, so the rows are rendered once all are fetched.
+            result = ColumnarResult.from_batches(col_names, batches)
+            normalized_rows = result.normalized_rows(typed=self.typed_normalization)
+
+            if self.result_cache:
+                self.result_cache.put(reader.db_path, self._fingerprint(reader), sql, normalized_rows, col_names,
+                                      self._cache_variant(budget))
+
+            return normalized_rows, col_names, None
 
+        except QueryTimeoutError as e:
+            # Returned as the exception itself so evaluate_query can tell it apart from SQL errors.
+            return None, [], e
         except Exception as e:
             return None, [], str(e)
 
-    def _check_strict_accuracy(self, gt_rows, pred_rows):
-        gt_set = set(tuple(r) for r in gt_rows)
-        pred_set = set(tuple(r) for r in pred_rows)
-        
-        return gt_set == pred_set
+    def _digest_sql(self, sql, budget=None, reader=None):
+        """
+        Like _execute_sql, but builds a ResultDigest of the rows while streaming them.
+        The rows themselves are kept, and cached, only while there are at most digest_keep_rows.
+        Returns (digest, column_names, error, rows or None).
+
+        Batches are rendered with the float columns decided so far (see normalize_rows). When a later
+        batch changes that decision (e.g. the first NULL of an INTEGER column), the digest is rebuilt:
+        from the kept rows, or by running the query again with the final decision.
+        """
+        reader = reader or self.db_reader
+        if self.result_cache:
+            cached = self.result_cache.get(self._fingerprint(reader), sql, self._cache_variant(budget))
+            if cached is not None:
+                rows, col_names = cached
+                return ResultDigest.from_rows(rows), col_names, None, rows
+
+        try:
+            col_names, batches = self._stream_rows(sql, budget, reader)
+            digest = ResultDigest()
+            kept, kept_raw, kept_count = [], [], 0
+            intern_tables = {}
+            column_types = plan = None
+            stale = False
+            for batch in batches:
+                chunk = ColumnarResult.from_rows(col_names, batch)
+                if not self.typed_normalization:
+                    types = chunk.value_types()
+                    column_types = types if column_types is None else [a | b for a, b in zip(column_types, types)]
+                    stale = stale or (plan is not None and float_columns(column_types) != plan)
+                    plan = float_columns(column_types)
+                if stale:
+                    rows = None
+                else:
+                    rows = chunk.normalized_rows(intern_tables, typed=self.typed_normalization, float_plan=plan)
+                    digest.update(rows)
+                if kept is not None:
+                    kept_raw.append(chunk)
+                    kept_count += len(chunk)
+                    if rows is not None:
+                        kept.extend(rows)
+                    if kept_count > self.digest_keep_rows:
+                        kept = kept_raw = None
+
+            if stale and kept is not None:
+                kept = ColumnarResult.concat(col_names, kept_raw).normalized_rows()
+                digest = ResultDigest.from_rows(kept)
+            elif stale:
+                digest = ResultDigest()
+                for batch in self._stream_rows(sql, budget, reader)[1]:
+                    digest.update(ColumnarResult.from_rows(col_names, batch).normalized_rows(intern_tables,
+                                                                                             float_plan=plan))
+
+            if kept is not None and self.result_cache:
+                self.result_cache.put(reader.db_path, self._fingerprint(reader), sql, kept, col_names,
+                                      self._cache_variant(budget))
+            return digest, col_names, None, kept
+
+        except QueryTimeoutError as e:
+            return None, [], e, None
+        except Exception as e:
+            return None, [], str(e), None
+
+    def _run_pair(self, func, gt_sql, pred_sql, budget, reader=None):
+        """
+        Runs func(gt_sql) and func(pred_sql, budget), overlapping them when enabled.
+        The predicted query goes to a helper thread while the GT query runs in the caller.
+        """
+        if not self.concurrent_execution:
+            return func(gt_sql, None, reader), func(pred_sql, budget, reader)
+
+        with self._pair_executor_lock:
+            if self._pair_executor is None:
+                self._pair_executor = ThreadPoolExecutor(
+                    max_workers=self.db_reader.pool_size,
+                    thread_name_prefix="bird-eval"
+                )
+        pred_future = self._pair_executor.submit(func, pred_sql, budget, reader)
+        gt_result = func(gt_sql, None, reader)
+        return gt_result, pred_future.result()
+
+    def _gt_shape(self, gt_sql, gt_res, gt_cols, reader):
+        key = (reader.db_path, normalize_sql(gt_sql))
+        shape = self._gt_shapes.get(key)
+        if shape is None:
+            rows = [tuple(row) for row in gt_res]
+            shape = {
+                "rows": len(rows),
+                "distinct_rows": len(set(rows)),
+                "cols": len(gt_cols),
+                "max_row_values": max((len(set(row)) for row in rows), default=0)
+            }
+            self._gt_shapes[key] = shape
+        return shape
+
+    def _probe_prediction(self, gt_sql, gt_res, gt_cols, pred_sql, budget, reader):
+        """
+        Checks the predicted query's column count and (capped) row count against the GT shape.
+        Returns None when the prediction may still match, otherwise a dict with the probed
+        columns, row count and either a rejection reason or the timeout error.
+
+        Rules follow the match types: EXACT/STRICT need the same width and at least as many
+        rows as distinct GT rows; SUPER_SOFT allows extra columns and rows but needs at least
+        as many rows as the GT and as many columns as the most distinct values in a GT row.
+        An empty GT result matches any prediction through SUPER_SOFT, so it is never rejected.
+        """
+        shape = self._gt_shape(gt_sql, gt_res, gt_cols, reader)
+        if shape["rows"] == 0:
+            return None
+
+        row_cap = min(self.probe_cap, shape["rows"])
+        try:
+            if self.executor_pool:
+                pred_cols, pred_rows = self.executor_pool.probe(reader.db_path, pred_sql, row_cap, **budget)
+            else:
+                pred_cols, pred_rows = reader.probe_select_query(
+                    pred_sql,
+                    row_cap,
+                    **budget
+                )
+        except QueryTimeoutError as e:
+            return {"columns": [], "rows": 0, "error": e}
+        except Exception:
+            # Let the normal execution path report SQL errors.
+            return None
+
+        pred_cols = [str(col).strip().lower() for col in pred_cols]
+        reason = None
+        if len(pred_cols) < shape["max_row_values"]:
+            reason = f"Column Count Mismatch: Expected {shape['max_row_values']}+, Got {len(pred_cols)}"
+        elif len(pred_cols) == shape["cols"] and pred_rows < shape["distinct_rows"] and pred_rows < row_cap:
+            reason = f"Row Count Mismatch: Expected {shape['distinct_rows']}+, Got {pred_rows}"
+        elif len(pred_cols) != shape["cols"] and pred_rows < shape["rows"] and pred_rows < row_cap:
+            reason = f"Row Count Mismatch: Expected {shape['rows']}+, Got {pred_rows}"
+
+        if reason is None:
+            return None
+        return {"columns": pred_cols, "rows": pred_rows, "reason": f"Probe Rejected: {reason}"}
 
     def _check_soft_accuracy_ordered_mapped(self, gt_rows, pred_rows):
         if len(pred_rows) < len(gt_rows):
@@ -75,38 +385,213 @@ class BirdEvaluator:
         return True, "Soft Match Successful (Mapped & Ordered)"
     
     def _check_super_soft_accuracy(self, gt_rows, pred_rows):
+        """
+        Each GT row (as a set) must be a subset of a distinct prediction row, assigned greedily
+        to the first unused candidate. Candidates come from an inverted value -> row index
+        built once, scanning the posting list of the GT row's rarest value.
+        """
         if len(pred_rows) < len(gt_rows):
             return False, f"Row Count Mismatch: Expected {len(gt_rows)}, Got {len(pred_rows)}"
         
         if not gt_rows:
             return True, "Empty Result Match"
 
-        used_pred_indices = set()
+        pred_sets = [frozenset(row) for row in pred_rows]
+        value_index = {}
+        for j, pred_set in enumerate(pred_sets):
+            for value in pred_set:
+                value_index.setdefault(value, []).append(j)
+
+        all_pred_indices = range(len(pred_rows))
+        used = bytearray(len(pred_rows))
+        # Earlier candidates of an already-matched GT set are either used or not supersets,
+        # so repeated GT rows resume scanning where the previous match stopped.
+        resume_at = {}
+
+        for gt_row in gt_rows:
+            gt_row_set = frozenset(gt_row)
+
+            if gt_row_set:
+                postings = [value_index.get(value) for value in gt_row_set]
+                candidates = None if None in postings else min(postings, key=len)
+            else:
+                candidates = all_pred_indices
 
-        for i, gt_row in enumerate(gt_rows):
-            gt_row_set = set(gt_row) 
-            
             match_found = False
-            
-            for j, pred_row in enumerate(pred_rows):
-                if j in used_pred_indices:
-                    continue
-                
-                pred_row_set = set(pred_row)
-                
-                if gt_row_set.issubset(pred_row_set):
-                    match_found = True
-                    used_pred_indices.add(j) 
-                    break
+            if candidates is not None:
+                for pos in range(resume_at.get(gt_row_set, 0), len(candidates)):
+                    j = candidates[pos]
+                    if used[j]:
+                        continue
+                    if gt_row_set <= pred_sets[j]:
+                        used[j] = 1
+                        resume_at[gt_row_set] = pos + 1
+                        match_found = True
+                        break
             
             if not match_found:
-                return False, f"Row {gt_row} (as set) not found in prediction rows (subset check)."
+                return False, f"Row {list(gt_row)} (as set) not found in prediction rows (subset check)."
 
         return True, "Super Soft Match Successful (Rows as Sets & Subset Check)"
 
-    def evaluate_query(self, query_id, natural_language_query, gt_sql, pred_sql, token_stats=None):
-        gt_res, gt_cols, gt_err = self._execute_sql(gt_sql)
-        pred_res, pred_cols, pred_err = self._execute_sql(pred_sql)
+    @staticmethod
+    def _timing_summary(samples):
+        """
+        Drops samples more than 3 standard deviations from the mean (as BIRD's VES script does)
+        and summarizes the rest.
+        """
+        mean = sum(samples) / len(samples)
+        std = math.sqrt(sum((s - mean) ** 2 for s in samples) / len(samples))
+        kept = [s for s in samples if abs(s - mean) <= 3 * std] or samples
+        kept_mean = sum(kept) / len(kept)
+        return {
+            "mean": kept_mean,
+            "std": math.sqrt(sum((s - kept_mean) ** 2 for s in kept) / len(kept)),
+            "min": min(kept),
+            "max": max(kept),
+            "runs": len(samples),
+            "trimmed": len(samples) - len(kept),
+            "samples": samples
+        }
+
+    def _run_timed(self, sql, budget, reader):
+        """
+        Runs sql to completion and returns the elapsed seconds. Like _stream_rows, a budget
+        applies through the progress handler, or through the worker pool when there is one.
+        """
+        start = time.perf_counter()
+        if self.executor_pool:
+            stream = self.executor_pool.stream(reader.db_path, sql, batch_size=self.batch_size, **(budget or {}))
+        else:
+            stream = reader.stream_select_query(sql, batch_size=self.batch_size, **(budget or {}))
+        for _ in stream:
+            pass
+        return time.perf_counter() - start
+
+    def _measure_efficiency(self, gt_sql, pred_sql, budget, reader):
+        """
+        Times both queries efficiency_runs times and returns (ves, timing),
+        where ves = sqrt(gt_mean / pred_mean) over the trimmed samples.
+        GT and prediction runs alternate so drift affects both alike; one untimed run of each warms the cache.
+        Every prediction run keeps the prediction's budget. In-process runs share one warm connection;
+        with isolated workers both queries run in the pool, so both timings include the same overhead.
+        Failures (including a timed-out prediction) are raised.
+        """
+        samples = {"gt": [], "pred": []}
+        runs = (("gt", gt_sql, None), ("pred", pred_sql, budget))
+        pinned = reader if not self.executor_pool and reader.conn is None else nullcontext()
+        with pinned:
+            for _, sql, sql_budget in runs:
+                self._run_timed(sql, sql_budget, reader)
+            for _ in range(self.efficiency_runs):
+                for key, sql, sql_budget in runs:
+                    samples[key].append(self._run_timed(sql, sql_budget, reader))
+
+        timing = {key: self._timing_summary(values) for key, values in samples.items()}
+        pred_mean = timing["pred"]["mean"]
+        ves = math.sqrt(timing["gt"]["mean"] / pred_mean) if pred_mean > 0 else 0.0
+        return ves, timing
+
+    @staticmethod
+    def _record_execution_error(result_log, gt_err, pred_err):
+        """
+        Sets the status of a failed execution (prediction first, then GT) on result_log.
+        Returns True when there is nothing to compare.
+        """
+        if isinstance(pred_err, QueryTimeoutError):
+            result_log["execution_status"] = "TIMEOUT"
+            result_log["failure_reason"] = f"SQL Execution Timed Out: {pred_err}"
+        elif pred_err:
+            result_log["execution_status"] = "SQL_ERROR"
+            result_log["failure_reason"] = f"SQL Execution Failed: {pred_err}"
+        elif gt_err:
+            result_log["execution_status"] = "GT_ERROR"
+            result_log["failure_reason"] = f"Ground Truth Execution Failed: {gt_err}"
+        else:
+            return False
+        return True
+
+    @staticmethod
+    def _comparable_rows(result):
+        if isinstance(result, ColumnarResult):
+            return result.normalized_rows()
+        return [tuple(row) for row in result]
+
+    def _compare_results(self, gt_res, pred_res, gt_cols, pred_cols):
+        """
+        Single comparator for all match types. Rows are hashed once as tuples and reused by
+        the exact, strict (set) and super-soft checks; the ordered soft mapping only matters
+        for the reason attached to a strict match, so it runs only in that case.
+        gt_res / pred_res may also be ColumnarResult objects, which are normalized column-wise.
+        Returns (match_type, failure_reason).
+        """
+        gt_rows = self._comparable_rows(gt_res)
+        pred_rows = self._comparable_rows(pred_res)
+
+        if gt_rows == pred_rows:
+            return "EXACT_MATCH", None
+
+        details = []
+        if len(pred_rows) > len(gt_rows): details.append("Extra Rows")
+        if len(pred_cols) > len(gt_cols): details.append("Extra Columns")
+        smart_map_reason = f"Logic Correct (Smart Map): {', '.join(details)}" if details else "Column Order Differs"
+
+        if set(gt_rows) == set(pred_rows):
+            is_soft, _ = self._check_soft_accuracy_ordered_mapped(gt_rows, pred_rows)
+            return "STRICT_EXACT_MATCH", smart_map_reason if is_soft else None
+
+        is_super_soft, super_soft_msg = self._check_super_soft_accuracy(gt_rows, pred_rows)
+        if is_super_soft:
+            return "SUPER_SOFT_MATCH", smart_map_reason
+        return "WRONG", super_soft_msg
+
+    def evaluate_query(self, query_id, natural_language_query, gt_sql, pred_sql, token_stats=None,
+                       timeout_seconds=None, max_vm_steps=None, db_id=None):
+        """
+        Executes both queries and classifies the prediction.
+        timeout_seconds / max_vm_steps override the evaluator's budget for this prediction only.
+        db_id routes the question to another BIRD database (default: the evaluator's db_filename).
+        """
+        budget = self._prediction_budget(timeout_seconds, max_vm_steps)
+        if db_id is None:
+            return self._evaluate_on(self.db_reader, query_id, natural_language_query, gt_sql, pred_sql,
+                                     token_stats, budget)
+        with self.readers.use(db_id) as reader:
+            result_log = self._evaluate_on(reader, query_id, natural_language_query, gt_sql, pred_sql,
+                                           token_stats, budget)
+        result_log["db_id"] = db_id
+        return result_log
+
+    def _evaluate_on(self, reader, query_id, natural_language_query, gt_sql, pred_sql, token_stats, budget):
+        gt_digest = pred_digest = None
+        probe = None
+        if self.digest_mode:
+            (gt_digest, gt_cols, gt_err, gt_res), (pred_digest, pred_cols, pred_err, pred_res) = self._run_pair(
+                self._digest_sql, gt_sql, pred_sql, budget, reader
+            )
+            gt_count = gt_digest.row_count if gt_digest else 0
+            pred_count = pred_digest.row_count if pred_digest else 0
+        elif self.probe_predictions:
+            # The probe needs the GT shape first, so this path stays sequential.
+            gt_res, gt_cols, gt_err = self._execute_sql(gt_sql, None, reader)
+            if gt_res is not None:
+                probe = self._probe_prediction(gt_sql, gt_res, gt_cols, pred_sql, budget, reader)
+
+            if probe:
+                pred_res, pred_cols, pred_err = None, probe["columns"], probe.get("error")
+            else:
+                pred_res, pred_cols, pred_err = self._execute_sql(pred_sql, budget, reader)
+        else:
+            (gt_res, gt_cols, gt_err), (pred_res, pred_cols, pred_err) = self._run_pair(
+                self._execute_sql, gt_sql, pred_sql, budget, reader
+            )
+
+        if not self.digest_mode:
+            gt_count = len(gt_res) if gt_res else 0
+            pred_count = probe["rows"] if probe else (len(pred_res) if pred_res else 0)
+            if self.log_digests:
+                gt_digest = ResultDigest.from_rows(gt_res) if gt_res is not None else None
+                pred_digest = ResultDigest.from_rows(pred_res) if pred_res is not None else None
 
         result_log = {
             "timestamp": datetime.now().isoformat(),
@@ -119,49 +604,159 @@ class BirdEvaluator:
             "match_type": "NONE",
             "failure_reason": None,
             "result_summary": {
-                "gt_rows": len(gt_res) if gt_res else 0,
-                "pred_rows": len(pred_res) if pred_res else 0,
+                "gt_rows": gt_count,
+                "pred_rows": pred_count,
                 "gt_cols": len(gt_cols),
                 "pred_cols": len(pred_cols)
             }
         }
 
-        if pred_err:
-            result_log["execution_status"] = "SQL_ERROR"
-            result_log["failure_reason"] = f"SQL Execution Failed: {pred_err}"
-            return result_log
+        if self.efficiency_runs:
+            # Incorrect or failed predictions score 0, as in BIRD's VES.
+            result_log["ves"] = 0.0
 
-        if gt_res == pred_res:
-            result_log["match_type"] = "EXACT_MATCH"
+        if self.log_digests:
+            result_summary = result_log["result_summary"]
+            result_summary["gt_digest"] = gt_digest.to_dict() if gt_digest else None
+            result_summary["pred_digest"] = pred_digest.to_dict() if pred_digest else None
+
+        if self._record_execution_error(result_log, gt_err, pred_err):
             return result_log
 
-        is_soft, soft_msg = self._check_soft_accuracy_ordered_mapped(gt_res, pred_res)
-        
-        if is_soft:
-            result_log["match_type"] = "SOFT_MATCH"
-            details = []
-            if len(pred_res) > len(gt_res): details.append("Extra Rows")
-            if len(pred_cols) > len(gt_cols): details.append("Extra Columns")
-            
-            reason = f"Logic Correct (Smart Map): {', '.join(details)}" if details else "Column Order Differs"
-            result_log["failure_reason"] = reason
-        
-        if self._check_strict_accuracy(gt_res, pred_res):
-            result_log["match_type"] = "STRICT_EXACT_MATCH"
+        if probe:
+            result_log["match_type"] = "WRONG"
+            result_log["failure_reason"] = probe["reason"]
             return result_log
 
-        is_soft, soft_msg = self._check_super_soft_accuracy(gt_res, pred_res)
-        if is_soft:
-            result_log["match_type"] = "SUPER_SOFT_MATCH"
-            details = []
-            if len(pred_res) > len(gt_res): details.append("Extra Rows")
-            if len(pred_cols) > len(gt_cols): details.append("Extra Columns")
-            
-            reason = f"Logic Correct (Smart Map): {', '.join(details)}" if details else "Column Order Differs"
-            result_log["failure_reason"] = reason
+        if self.digest_mode and gt_digest and gt_digest.ordered == pred_digest.ordered:
+            result_log["match_type"] = "EXACT_MATCH"
+        elif (self.digest_mode and (gt_res is None or pred_res is None)
+              and gt_digest.multiset == pred_digest.multiset):
+            # Same rows, as often, in another order: the set check can only pass, so the result
+            # that was too large to keep is not fetched again. The ordered soft mapping needs rows,
+            # so no Smart Map reason is attached here.
+            result_log["match_type"] = "STRICT_EXACT_MATCH"
         else:
-            result_log["match_type"] = "WRONG"
-            result_log["failure_reason"] = soft_msg
+            if self.digest_mode and (gt_res is None or pred_res is None):
+                # Digests disagree and a result was too large to keep: the strict/soft/super-soft
+                # checks need its rows, so only that side is fetched again.
+                if gt_res is None and pred_res is None:
+                    (gt_res, gt_cols, gt_err), (pred_res, pred_cols, pred_err) = self._run_pair(
+                        self._execute_sql, gt_sql, pred_sql, budget, reader
+                    )
+                elif gt_res is None:
+                    gt_res, gt_cols, gt_err = self._execute_sql(gt_sql, None, reader)
+                else:
+                    pred_res, pred_cols, pred_err = self._execute_sql(pred_sql, budget, reader)
+                if self._record_execution_error(result_log, gt_err, pred_err):
+                    return result_log
+
+            match_type, failure_reason = self._compare_results(gt_res, pred_res, gt_cols, pred_cols)
+            result_log["match_type"] = match_type
+            result_log["failure_reason"] = failure_reason
+
+        if self.efficiency_runs and result_log["match_type"] in MATCH_TYPES:
+            try:
+                result_log["ves"], result_log["timing"] = self._measure_efficiency(gt_sql, pred_sql, budget, reader)
+            except QueryTimeoutError as e:
+                result_log["ves_error"] = f"Efficiency Run Timed Out: {e}"
+            except Exception as e:
+                result_log["ves_error"] = f"Efficiency Run Failed: {e}"
 
         return result_log
 
+    def close(self):
+        """
+        Stops the pair-execution threads and the SQL worker processes and closes the readers
+        and the result cache. The evaluator cannot be used afterwards.
+        """
+        with self._pair_executor_lock:
+            if self._pair_executor is not None:
+                self._pair_executor.shutdown(wait=True)
+                self._pair_executor = None
+        if self.executor_pool:
+            self.executor_pool.close()
+        self.readers.close()
+        if self.result_cache:
+            self.result_cache.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _evaluate_item(self, item):
+        try:
+            return self.evaluate_query(**item)
+        except Exception as e:
+            return {
+                "timestamp": datetime.now().isoformat(),
+                "query_id": item.get("query_id"),
+                "nl_query": item.get("natural_language_query"),
+                "sql_ground_truth": item.get("gt_sql"),
+                "sql_predicted": item.get("pred_sql"),
+                "token_stats": item.get("token_stats") or {},
+                "execution_status": "EVALUATOR_ERROR",
+                "match_type": "NONE",
+                "failure_reason": str(e)
+            }
+
+    def evaluate_many(self, items, workers=1, use_processes=False):
+        """
+        Evaluates a list of evaluate_query keyword dicts (query_id, natural_language_query,
+        gt_sql, pred_sql, token_stats) on a thread or process pool.
+        Yields the result logs in input order. Each worker checks out its own read-only
+        connection (threads) or builds its own evaluator (processes).
+        """
+        items = list(items)
+        if workers <= 1 or len(items) <= 1:
+            for item in items:
+                yield self._evaluate_item(item)
+            return
+
+        if use_processes:
+            config = {
+                "db_filename": self.db_reader.source_db_path,
+                "result_cache_path": self.result_cache_path,
+                "timeout_seconds": self.timeout_seconds,
+                "max_vm_steps": self.max_vm_steps,
+                "batch_size": self.batch_size,
+                "digest_mode": self.digest_mode,
+                "digest_keep_rows": self.digest_keep_rows,
+                "log_digests": self.log_digests,
+                "probe_predictions": self.probe_predictions,
+                "probe_cap": self.probe_cap,
+                "concurrent_execution": self.concurrent_execution,
+                "prefer_accelerated": self.prefer_accelerated,
+                "db_mode": self.db_reader.db_mode,
+                "memory_limit_mb": self.memory_limit_mb,
+                "efficiency_runs": self.efficiency_runs,
+                "max_open_databases": self.max_open_databases,
+                "isolated_workers": self.isolated_workers,
+                "worker_memory_limit_mb": self.worker_memory_limit_mb,
+                "kill_timeout_seconds": self.kill_timeout_seconds,
+                "typed_normalization": self.typed_normalization
+            }
+            # Spawned like the SQL workers: a fork would copy the pair-execution threads' locks and the
+            # pooled connections of this evaluator into every worker.
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker_evaluator, initargs=(config,),
+                                           mp_context=multiprocessing.get_context("spawn"))
+            chunksize = max(1, len(items) // (workers * 4))
+            with executor:
+                yield from executor.map(_evaluate_in_worker, items, chunksize=chunksize)
+        else:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                yield from executor.map(self._evaluate_item, items)
+
+
+_worker_evaluator = None
+
+
+def _init_worker_evaluator(config):
+    global _worker_evaluator
+    _worker_evaluator = BirdEvaluator(**config)
+
+
+def _evaluate_in_worker(item):
+    return _worker_evaluator._evaluate_item(item)
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import zlib
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "sql_results.sqlite")
+
+# Quoted strings and identifiers are kept verbatim; whitespace is only collapsed outside them.
+_QUOTED_PATTERN = re.compile(r"('(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|`[^`]*`)")
+
+
+def normalize_sql(sql):
+    parts = _QUOTED_PATTERN.split(sql.strip())
+    for i in range(0, len(parts), 2):
+        parts[i] = re.sub(r"\s+", " ", parts[i])
+    return "".join(parts).strip().rstrip(";").strip()
+
+
+def database_fingerprint(db_path):
+    """
+    Cheap fingerprint of a SQLite file: size, mtime and the 100-byte header,
+    which includes the file change counter bumped by every write transaction.
+    """
+    stat = os.stat(db_path)
+    with open(db_path, 'rb') as f:
+        header = f.read(100)
+    digest = hashlib.sha1()
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}:".encode())
+    digest.update(header)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_path=DEFAULT_CACHE_PATH, max_rows=200000):
+        """
+        On-disk store of normalized result sets keyed by (database fingerprint, normalized SQL).
+        Payloads are zlib-compressed JSON. Results larger than max_rows are not stored.
+        """
+        self.cache_path = cache_path
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                db_path TEXT NOT NULL,
+                fingerprint TEXT NOT NULL,
+                sql_hash TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                PRIMARY KEY (fingerprint, sql_hash)
+            )
+        """)
+        self.conn.commit()
+
+    def register_database(self, db_path):
+        """
+        Returns the fingerprint of db_path and drops entries recorded for older versions of that file.
+        """
+        db_path = os.path.abspath(db_path)
+        fingerprint = database_fingerprint(db_path)
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM results WHERE db_path = ? AND fingerprint != ?",
+                (db_path, fingerprint)
+            )
+            self.conn.commit()
+        return fingerprint
+
+    @staticmethod
+    def _sql_hash(sql, variant=""):
+        key = normalize_sql(sql)
+        if variant:
+            key = f"{variant}\x00{key}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def get(self, fingerprint, sql, variant=""):
+        """
+        variant separates results of the same SQL that are not interchangeable
+        (e.g. another row normalization); "" is the default entry.
+        """
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT payload FROM results WHERE fingerprint = ? AND sql_hash = ?",
+                (fingerprint, self._sql_hash(sql, variant))
+            ).fetchone()
+        if row is None:
+            return None
+        data = json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        return data["rows"], data["cols"]
+
+    def put(self, db_path, fingerprint, sql, rows, cols, variant=""):
+        if len(rows) > self.max_rows:
+            return
+        payload = zlib.compress(
+            json.dumps({"cols": cols, "rows": rows}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        )
+        with self._lock:
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO results (db_path, fingerprint, sql_hash, payload) VALUES (?, ?, ?, ?)",
+                    (os.path.abspath(db_path), fingerprint, self._sql_hash(sql, variant), payload)
+                )
+                self.conn.commit()
+            except sqlite3.OperationalError as e:
+                # A busy cache (e.g. many worker processes) must never fail an evaluation.
+                print(f"Result cache write skipped: {e}")
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
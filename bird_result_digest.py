@@ -0,0 +1,52 @@
+import hashlib
+
+_MULTISET_MASK = (1 << 128) - 1
+
+
+class ResultDigest:
+    def __init__(self):
+        """
+        Digests of a normalized result set built while streaming rows.
+        'ordered' changes with row order; 'multiset' is the sum of per-row hashes modulo 2^128,
+        so it only depends on which rows occur and how often.
+        """
+        self._ordered = hashlib.blake2b(digest_size=16)
+        self._multiset = 0
+        self.row_count = 0
+        self.col_count = 0
+
+    @staticmethod
+    def _encode_row(row):
+        # Length-prefixed values keep the encoding unambiguous whatever the cell contents are.
+        return "".join(f"{len(value)}:{value}" for value in row).encode('utf-8')
+
+    def update(self, rows):
+        for row in rows:
+            encoded = self._encode_row(row)
+            self._ordered.update(len(encoded).to_bytes(8, 'little'))
+            self._ordered.update(encoded)
+            row_hash = hashlib.blake2b(encoded, digest_size=16).digest()
+            self._multiset = (self._multiset + int.from_bytes(row_hash, 'little')) & _MULTISET_MASK
+            self.row_count += 1
+            self.col_count = len(row)
+
+    @classmethod
+    def from_rows(cls, rows):
+        digest = cls()
+        digest.update(rows)
+        return digest
+
+    @property
+    def ordered(self):
+        return self._ordered.hexdigest()
+
+    @property
+    def multiset(self):
+        return f"{self._multiset:032x}"
+
+    def to_dict(self):
+        return {
+            "ordered": self.ordered,
+            "multiset": self.multiset,
+            "rows": self.row_count
+        }
@@ -0,0 +1,216 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from bird_db_registry import get_registry
+from bird_db_reader import accelerated_path, source_stamp
+from bird_evaluator import normalize_rows
+
+# Composite indexes covering the join + filter patterns of the BIRD dev queries, per db_id.
+COVERING_INDEXES = {
+    "financial": [
+        ("trans", ["account_id", "date", "amount"]),
+        ("trans", ["date", "amount"]),
+        ("trans", ["operation", "amount"]),
+        ("trans", ["type", "account_id"]),
+        ("trans", ["k_symbol", "account_id"]),
+        ("disp", ["account_id", "client_id", "type"]),
+        ("client", ["gender", "district_id"]),
+        ("loan", ["account_id", "amount", "status"]),
+    ]
+}
+
+DATE_TYPES = ("DATE", "DATETIME", "TIMESTAMP")
+
+# Year expression used by the dev queries. SQLite only uses an expression index when the query
+# repeats the indexed expression, so this matches STRFTIME('%Y', date) = '1997' style filters.
+# Month ('%Y-%m') indexes are left out: the planner picks them to skip the sort of a GROUP BY month,
+# and reading the whole table through the index is several times slower than a scan.
+DATE_EXPRESSIONS = {
+    "year": "strftime('%Y', \"{col}\")",
+}
+
+
+class AcceleratedDBBuilder:
+    def __init__(self, source_path, output_path=None, db_id=None, analyze=True):
+        """
+        Builds <stem>_accel.sqlite: a copy of a BIRD database with foreign-key indexes,
+        covering indexes, year expression indexes on date columns and ANALYZE statistics.
+        Tables and rows are untouched, so every query returns what it returns on the source.
+        """
+        self.source_path = os.path.abspath(source_path)
+        self.output_path = output_path or accelerated_path(self.source_path)
+        self.db_id = db_id or os.path.splitext(os.path.basename(self.source_path))[0]
+        self.analyze = analyze
+
+    @staticmethod
+    def _tables(conn):
+        return [row[0] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        )]
+
+    @staticmethod
+    def _leading_columns(conn, table):
+        """
+        Columns already usable as the first key of an index (including an INTEGER PRIMARY KEY).
+        """
+        leading = set()
+        for row in conn.execute(f'PRAGMA table_info("{table}")'):
+            if row[5] == 1 and row[2].upper() == "INTEGER":
+                leading.add(row[1].lower())
+        for index in conn.execute(f'PRAGMA index_list("{table}")'):
+            info = conn.execute(f'PRAGMA index_info("{index[1]}")').fetchall()
+            if info and info[0][2]:
+                leading.add(info[0][2].lower())
+        return leading
+
+    def _index_statements(self, conn):
+        statements = []
+        for table in self._tables(conn):
+            leading = self._leading_columns(conn, table)
+
+            for fk in conn.execute(f'PRAGMA foreign_key_list("{table}")'):
+                col = fk[3]
+                if col.lower() in leading:
+                    continue
+                leading.add(col.lower())
+                statements.append(f'CREATE INDEX "accel_{table}_{col}" ON "{table}" ("{col}")')
+
+            for row in conn.execute(f'PRAGMA table_info("{table}")'):
+                col, col_type = row[1], (row[2] or "").upper()
+                if not col_type.startswith(DATE_TYPES):
+                    continue
+                for name, expression in DATE_EXPRESSIONS.items():
+                    statements.append(
+                        f'CREATE INDEX "accel_{table}_{col}_{name}" ON "{table}" ({expression.format(col=col)})'
+                    )
+
+        for table, cols in COVERING_INDEXES.get(self.db_id, []):
+            col_list = ", ".join(f'"{col}"' for col in cols)
+            statements.append(f'CREATE INDEX "accel_{table}_{"_".join(cols)}" ON "{table}" ({col_list})')
+        return statements
+
+    def build(self):
+        """
+        Copies the source with the SQLite backup API, adds the indexes and runs ANALYZE.
+        The source fingerprint is stored as PRAGMA user_version so readers can detect a stale copy.
+        Returns the executed CREATE INDEX statements.
+        """
+        tmp_path = f"{self.output_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        target = sqlite3.connect(tmp_path)
+        try:
+            source.backup(target)
+            statements = self._index_statements(target)
+            for statement in statements:
+                print(f"   -> {statement}")
+                target.execute(statement)
+            if self.analyze:
+                target.execute("ANALYZE")
+            target.execute(f"PRAGMA user_version = {source_stamp(self.source_path)}")
+            target.commit()
+        finally:
+            target.close()
+            source.close()
+
+        os.replace(tmp_path, self.output_path)
+        return statements
+
+    def _run(self, db_path, sql):
+        conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+        try:
+            start = time.perf_counter()
+            rows = conn.execute(sql).fetchall()
+            return normalize_rows(rows), time.perf_counter() - start
+        finally:
+            conn.close()
+
+    def verify(self, queries):
+        """
+        Runs every query on the source and on the copy and compares the normalized results.
+        A query is 'identical', 'reordered' (same rows in another order, only possible without a
+        total ORDER BY), 'different' or 'error' (fails on the source).
+        Queries that run more than twice as slow on the copy are listed under 'regressions'.
+        """
+        report = {"identical": 0, "reordered": 0, "different": 0, "error": 0,
+                  "source_seconds": 0.0, "accelerated_seconds": 0.0, "mismatches": [], "regressions": []}
+        for sql in queries:
+            try:
+                source_rows, source_time = self._run(self.source_path, sql)
+            except sqlite3.Error:
+                report["error"] += 1
+                continue
+            try:
+                accel_rows, accel_time = self._run(self.output_path, sql)
+            except sqlite3.Error as e:
+                report["different"] += 1
+                report["mismatches"].append({"sql": sql, "status": "different", "error": str(e)})
+                continue
+
+            report["source_seconds"] += source_time
+            report["accelerated_seconds"] += accel_time
+            if accel_time > 2 * source_time and accel_time - source_time > 0.05:
+                report["regressions"].append({"sql": sql, "source_seconds": source_time, "accelerated_seconds": accel_time})
+            if source_rows == accel_rows:
+                report["identical"] += 1
+                continue
+            status = "reordered" if Counter(source_rows) == Counter(accel_rows) else "different"
+            report[status] += 1
+            report["mismatches"].append({"sql": sql, "status": status})
+        return report
+
+
+def load_dev_queries(db_id, paths):
+    queries = []
+    for path in paths:
+        if not os.path.exists(path):
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            queries.extend(item['SQL'] for item in json.load(f) if item.get('db_id') == db_id)
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an indexed, analyzed copy of a BIRD database")
+    parser.add_argument("--db_id", type=str, default="financial")
+    parser.add_argument("--db_path", type=str, default=None, help="Source database (default: resolved from --db_id)")
+    parser.add_argument("--output", type=str, default=None, help="Copy path (default: <stem>_accel.sqlite next to the source)")
+    parser.add_argument("--dev_path", type=str, default="data/dev_20240627/dev.json")
+    parser.add_argument("--append_path", type=str, default="data/dev_20240627/dev_tied_append.json")
+    parser.add_argument("--no_analyze", action="store_true", help="Leave out ANALYZE statistics")
+    parser.add_argument("--skip_verify", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        source_path = get_registry().resolve(args.db_path) if args.db_path else get_registry().resolve_db_id(args.db_id)
+    except FileNotFoundError:
+        print(f"ERROR: database for '{args.db_id}' could not be found under the project directory.")
+        exit(1)
+
+    builder = AcceleratedDBBuilder(source_path, output_path=args.output, db_id=args.db_id, analyze=not args.no_analyze)
+    print(f"Building {builder.output_path}")
+    statements = builder.build()
+    print(f"Created {len(statements)} indexes" + (" and ANALYZE statistics" if builder.analyze else ""))
+
+    if args.skip_verify:
+        return
+
+    queries = load_dev_queries(args.db_id, [args.dev_path, args.append_path])
+    print(f"Verifying {len(queries)} dev queries")
+    report = builder.verify(queries)
+    for mismatch in report.pop("mismatches"):
+        print(f"   [{mismatch['status']}] {mismatch['sql']}")
+    for regression in report.pop("regressions"):
+        print(f"   [slower {regression['source_seconds']:.3f}s -> {regression['accelerated_seconds']:.3f}s] {regression['sql']}")
+    print(json.dumps(report, indent=4))
+    if report["different"]:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
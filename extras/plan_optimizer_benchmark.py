@@ -0,0 +1,147 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.append(os.getcwd())
+from tqdm import tqdm
+from bird_db_reader import BirdDBReader, QueryTimeoutError, scaled_filename
+from bird_evaluator import normalize_rows
+from onePassLlmModel.plan_optimizer import PlanOptimizer
+from onePassLlmModel.sql_compiler import JSONToSQLCompiler
+
+
+def load_plans(paths, db_id):
+    """
+    Decomposer plans of the dev questions stored in pipeline reports (one per question).
+    """
+    plans, seen = [], set()
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found.")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = json.loads(line)
+                decomposer = data.get("steps", {}).get("decomposer", {})
+                json_plan = decomposer.get("json_plan")
+                question = data.get("query")
+                if not json_plan or decomposer.get("status") != "success" or question in seen:
+                    continue
+                if data.get("db_id", db_id) != db_id:
+                    continue
+                seen.add(question)
+                plans.append({"question": question, "json_plan": json_plan})
+    return plans
+
+
+def run_timed(db_reader, sql, repeats, timeout_seconds):
+    """
+    Best-of-repeats wall time of a query and its normalized rows (or the error).
+    """
+    best, rows = None, None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        try:
+            rows = [row for batch in db_reader.stream_select_query(sql, batch_size=10000, timeout_seconds=timeout_seconds)
+                    for row in normalize_rows(batch)]
+        except QueryTimeoutError:
+            return None, None, "timeout"
+        except Exception as e:
+            return None, None, str(e)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows, None
+
+
+def benchmark(plans, db_reader, optimizer, repeats=3, timeout_seconds=30):
+    report = {"plans": len(plans), "rewritten": 0, "identical": 0, "reordered": 0, "different": 0, "errors": 0,
+              "before_seconds": 0.0, "after_seconds": 0.0, "queries": []}
+    for item in tqdm(plans, desc="Benchmarking"):
+        try:
+            before_sql = JSONToSQLCompiler(item["json_plan"]).compile()
+            compiler = JSONToSQLCompiler(item["json_plan"], optimizer=optimizer, db_reader=db_reader)
+            after_sql = compiler.compile()
+        except Exception as e:
+            report["errors"] += 1
+            report["queries"].append({"question": item["question"], "error": f"compile: {e}"})
+            continue
+        if before_sql == after_sql:
+            continue
+
+        report["rewritten"] += 1
+        before_time, before_rows, before_err = run_timed(db_reader, before_sql, repeats, timeout_seconds)
+        after_time, after_rows, after_err = run_timed(db_reader, after_sql, repeats, timeout_seconds)
+        entry = {
+            "question": item["question"],
+            "optimizations": compiler.optimizations,
+            "sql_before": before_sql,
+            "sql_after": after_sql,
+            "before_seconds": before_time,
+            "after_seconds": after_time
+        }
+        if before_err or after_err:
+            # Both failing the same way (e.g. a plan that never compiled to valid SQL) is not a regression.
+            status = "identical" if before_err == after_err else "different"
+            entry["error"] = {"before": before_err, "after": after_err}
+        elif before_rows == after_rows:
+            status = "identical"
+        elif Counter(before_rows) == Counter(after_rows):
+            status = "reordered"
+        else:
+            status = "different"
+        entry["status"] = status
+        report[status] += 1
+        if before_time is not None and after_time is not None:
+            report["before_seconds"] += before_time
+            report["after_seconds"] += after_time
+        report["queries"].append(entry)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Before/after execution times of the plan optimizer on stored dev plans")
+    parser.add_argument("--reports", type=str, nargs="+", default=["results/pipeline_test_report_gpt_with_hint.jsonl"],
+                        help="Pipeline reports (.jsonl) holding the decomposer plans")
+    parser.add_argument("--db_id", type=str, default="financial")
+    parser.add_argument("--db_path", type=str, default="financial.sqlite")
+    parser.add_argument("--scale", type=int, default=1, help="Run on the copy built by scale_financial_db.py")
+    parser.add_argument("--accelerated", action="store_true", help="Read from the indexed copy built by build_accelerated_db.py")
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=30, help="Wall-clock budget (seconds) per query run")
+    parser.add_argument("--output", type=str, default="results/plan_optimizer_benchmark.json")
+    args = parser.parse_args()
+
+    plans = load_plans(args.reports, args.db_id)
+    if not plans:
+        print("Error: No plans found!")
+        return
+
+    db_reader = BirdDBReader(scaled_filename(args.db_path, args.scale), prefer_accelerated=args.accelerated)
+    report = benchmark(plans, db_reader, PlanOptimizer(db_reader), repeats=args.repeats, timeout_seconds=args.timeout)
+
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+
+    print("\n" + "=" * 40)
+    print(f"Plans:             {report['plans']}")
+    print(f"Rewritten:         {report['rewritten']}")
+    print(f"  - Identical:     {report['identical']}")
+    print(f"  - Reordered:     {report['reordered']}")
+    print(f"  - Different:     {report['different']}")
+    print(f"Compile errors:    {report['errors']}")
+    print(f"Before:            {report['before_seconds']:.3f}s")
+    print(f"After:             {report['after_seconds']:.3f}s")
+    print("=" * 40)
+    print(f"Detailed report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
-import chromadb
-from chromadb.utils import embedding_functions
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.getcwd())
+from onePassLlmModel.semantic_resources import SemanticResources
+from onePassLlmModel.numpy_knn import DEFAULT_NUMPY_INDEX_DIR
 
 class VectorSearcher:
-    def __init__(self, db_path="./chroma_db"):
-        self.client = chromadb.PersistentClient(path=db_path)
-        self.emb_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+    def __init__(self, db_path="./chroma_db", backend="chroma", index_dir=DEFAULT_NUMPY_INDEX_DIR, resources=None):
+        """
+        backend: "chroma" or "numpy" (exact kNN over the export written by vector_db_builder.py).
+        """
+        self.resources = resources or SemanticResources(db_path, backend=backend, index_dir=index_dir)
 
     def search(self, table, column, query_text, n_results=1):
         """
@@ -14,52 +20,110 @@ class VectorSearcher:
         Returns: The actual DB value to use in SQL.
         """
         collection_name = f"{table}_{column}"
-        
+
         try:
-            collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.emb_fn
-            )
-            
+            collection = self.resources.get_collection(collection_name)
+
             results = collection.query(
                 query_texts=[query_text],
                 n_results=n_results
             )
-            
+
             if not results['metadatas'][0]:
                 return None, 0.0
-            
+
             # Extract best match
             best_match_meta = results['metadatas'][0][0] # {'db_value': 'POJISTNE', 'original': 'insurance payment'}
             distance = results['distances'][0][0] # Lower is better in Chroma (L2) usually, but check metric
-            
+
             # Simple confidence score simulation (inverse of distance)
             # Adjust logic based on your needs
             confidence = 1 / (1 + distance)
-            
+
             return best_match_meta['db_value'], confidence
 
         except Exception as e:
             print(f"Vector Search Error ({collection_name}) ({query_text}): {e}")
             return None, 0.0
 
+
+def compare_backends(chroma_searcher, numpy_searcher, queries, repeats=3):
+    """
+    Mean per-query latency of both backends and how often their top-1 values agree.
+    The embedding model is shared, so the latencies differ only by the index lookup.
+    """
+    report = {"queries": len(queries), "agree": 0, "max_confidence_diff": 0.0,
+              "chroma_ms": 0.0, "numpy_ms": 0.0, "disagreements": []}
+    for name, searcher in (("chroma", chroma_searcher), ("numpy", numpy_searcher)):
+        for t, c, _ in queries:
+            searcher.search(t, c, "warm up")
+        start = time.perf_counter()
+        for _ in range(repeats):
+            for t, c, q in queries:
+                searcher.search(t, c, q)
+        report[f"{name}_ms"] = 1000 * (time.perf_counter() - start) / (repeats * len(queries))
+
+    for t, c, q in queries:
+        chroma_val, chroma_conf = chroma_searcher.search(t, c, q)
+        numpy_val, numpy_conf = numpy_searcher.search(t, c, q)
+        if chroma_val == numpy_val:
+            report["agree"] += 1
+            report["max_confidence_diff"] = max(report["max_confidence_diff"], abs(chroma_conf - numpy_conf))
+        else:
+            report["disagreements"].append((q, chroma_val, numpy_val))
+    return report
+
 # --- Test ---
 if __name__ == "__main__":
-    searcher = VectorSearcher()
-    
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", type=str, default="chroma", choices=["chroma", "numpy", "compare"])
+    parser.add_argument("--db_path", type=str, default="./chroma_db")
+    parser.add_argument("--index_dir", type=str, default=DEFAULT_NUMPY_INDEX_DIR)
+    parser.add_argument("--repeats", type=int, default=3, help="Timed passes over the queries in compare mode")
+    args = parser.parse_args()
+
     test_cases = [
         ("district", "A2", "Prague"),       # Should find "Hl.m. Praha"
-        ("district", "A3", "lower Moravia"), 
+        ("district", "A3", "lower Moravia"),
         ("trans", "k_symbol", "pension"),   # Should find "DUCHOD"
         ("trans", "k_symbol", "insurenje"), # Typo test -> Should find "POJISTNE"
         ("loan", "status", "NOT paid yet"), # Should find "B"
         ("client", "gender", "female"), # Should find "B"
         ("client", "gender", "male") # Should find "B"
     ]
-    
-    print(f"{'Query':<20} | {'Found DB Value':<20} | {'Score':<5}")
-    print("-" * 55)
-    
-    for t, c, q in test_cases:
-        val, score = searcher.search(t, c, q)
-        print(f"{q:<20} | {str(val):<20} | {score:.2f}")
\ No newline at end of file
+
+    if args.backend == "compare":
+        chroma_searcher = VectorSearcher(args.db_path, backend="chroma", index_dir=args.index_dir)
+        # One model for both, loaded once
+        numpy_searcher = VectorSearcher(resources=SemanticResources(
+            args.db_path, backend="numpy", index_dir=args.index_dir,
+            embedding_function=chroma_searcher.resources.embedding_function
+        ))
+
+        # Beyond the hand-picked cases, every stored document of those collections, lowercased
+        queries = list(test_cases)
+        for t, c in dict.fromkeys((t, c) for t, c, _ in test_cases):
+            try:
+                documents = numpy_searcher.resources.get_collection(f"{t}_{c}").documents
+            except Exception as e:
+                print(f"Skipping {t}_{c}: {e}")
+                continue
+            queries.extend((t, c, doc.lower()) for doc in documents)
+
+        report = compare_backends(chroma_searcher, numpy_searcher, queries, repeats=args.repeats)
+        print(f"Queries:             {report['queries']}")
+        print(f"Top-1 agreement:     {report['agree']}/{report['queries']}")
+        print(f"Max confidence diff: {report['max_confidence_diff']:.6f}")
+        print(f"Chroma:              {report['chroma_ms']:.3f} ms/query")
+        print(f"NumPy:               {report['numpy_ms']:.3f} ms/query")
+        for q, chroma_val, numpy_val in report["disagreements"]:
+            print(f"  {q!r}: chroma={chroma_val!r} numpy={numpy_val!r}")
+    else:
+        searcher = VectorSearcher(args.db_path, backend=args.backend, index_dir=args.index_dir)
+
+        print(f"{'Query':<20} | {'Found DB Value':<20} | {'Score':<5}")
+        print("-" * 55)
+
+        for t, c, q in test_cases:
+            val, score = searcher.search(t, c, q)
+            print(f"{q:<20} | {str(val):<20} | {score:.2f}")
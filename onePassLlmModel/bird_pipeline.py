@@ -7,6 +7,11 @@ from onePassLlmModel.router_model_helper import load_router, predict_intent
 from onePassLlmModel.groq_ai_engine import GroqQueryDecomposer
 from onePassLlmModel.gpt_ai_engine import GptQueryDecomposer
 from onePassLlmModel.sql_compiler import JSONToSQLCompiler
+from onePassLlmModel.query_plan_gate import QueryPlanGate, COST_HIGH, COST_INVALID
+from onePassLlmModel.plan_optimizer import PlanOptimizer
+from onePassLlmModel.semantic_resources import get_semantic_resources
+from onePassLlmModel.semantic_cache import SemanticCache, DEFAULT_SEMANTIC_CACHE_PATH
+from onePassLlmModel.lexical_index import LEXICAL_CONFIDENCE_THRESHOLD
 from bird_evaluator import BirdEvaluator 
 
 class BirdSQLPipeline:
@@ -14,7 +19,33 @@ class BirdSQLPipeline:
                  model="groq",
                  router_path="./my_router_model", 
                  db_info_path="info/database_info.json", 
-                 db_path="financial.sqlite"):
+                 db_path="financial.sqlite",
+                 timeout_seconds=None,
+                 max_vm_steps=None,
+                 plan_gate=None,
+                 gated_timeout_seconds=2.0,
+                 gated_max_vm_steps=None,
+                 prefer_accelerated=False,
+                 db_mode="file",
+                 memory_limit_mb=2048,
+                 efficiency_runs=0,
+                 max_open_databases=4,
+                 isolated_workers=0,
+                 worker_memory_limit_mb=1024,
+                 optimize_plans=False,
+                 semantic_cache_path=DEFAULT_SEMANTIC_CACHE_PATH,
+                 semantic_backend="chroma",
+                 lexical_fast_path=True):
+        """
+        plan_gate: None (off), "record", "skip" or "down_budget".
+        "record" only logs the EXPLAIN QUERY PLAN and its cost class; "skip" does not execute
+        HIGH-cost plans; "down_budget" executes them under gated_timeout_seconds / gated_max_vm_steps.
+        With any gate mode, plans that fail to prepare (INVALID) are never executed.
+        optimize_plans: run PlanOptimizer over each decomposer plan before compiling it.
+        semantic_cache_path: on-disk store of resolved SEMANTIC values (None: no caching).
+        semantic_backend: "chroma" or "numpy" (exact kNN over the export written by VectorDBBuilder).
+        lexical_fast_path: resolve exact / near-exact SEMANTIC values from the lexical indexes first.
+        """
         
         print("Initializing BirdSQL Pipeline...")
         
@@ -27,15 +58,47 @@ class BirdSQLPipeline:
             self.decomposer = GroqQueryDecomposer(info_path=db_info_path)
         print("Decomposer Engine Loaded")
 
-        self.evaluator = BirdEvaluator(db_filename=db_path)
+        self.evaluator = BirdEvaluator(
+            db_filename=db_path,
+            timeout_seconds=timeout_seconds,
+            max_vm_steps=max_vm_steps,
+            prefer_accelerated=prefer_accelerated,
+            db_mode=db_mode,
+            memory_limit_mb=memory_limit_mb,
+            efficiency_runs=efficiency_runs,
+            max_open_databases=max_open_databases,
+            isolated_workers=isolated_workers,
+            worker_memory_limit_mb=worker_memory_limit_mb
+        )
         print("Evaluator Ready")
 
+        self.plan_gate_mode = plan_gate
+        self.gated_budget = {"timeout_seconds": gated_timeout_seconds, "max_vm_steps": gated_max_vm_steps}
+        self.plan_gate = QueryPlanGate(self.evaluator.db_reader) if plan_gate else None
+        if self.plan_gate:
+            print(f"Query Plan Gate Ready ({plan_gate})")
+
+        self.plan_optimizer = PlanOptimizer(self.evaluator.db_reader) if optimize_plans else None
+        # One embedding model / Chroma client for every question instead of one per compiler.
+        self.semantic_resources = get_semantic_resources(backend=semantic_backend)
+        self.semantic_cache = SemanticCache(semantic_cache_path) if semantic_cache_path else None
+        self.lexical_threshold = LEXICAL_CONFIDENCE_THRESHOLD if lexical_fast_path else None
+
+
+    def close(self):
+        """
+        Releases the evaluator's threads, worker processes and connections and the semantic cache.
+        """
+        self.evaluator.close()
+        if self.semantic_cache:
+            self.semantic_cache.close()
 
     def process_query(self, user_query, db_id="financial", ground_truth_sql=None, hint=None):
         start_time = time.time()
         
         result = {
             "query": user_query,
+            "db_id": db_id,
             "ground_truth_sql": ground_truth_sql,
             "status": "processing",
             "steps": {},
@@ -89,8 +152,23 @@ class BirdSQLPipeline:
 
         step_compiler = {"status": "pending", "generated_sql": None}
         try:
-            compiler = JSONToSQLCompiler(step_decomposer["json_plan"])
-            generated_sql = compiler.compile()
+            if self.plan_optimizer:
+                # The reader stays pinned until compilation is done, so the LRU cannot close it meanwhile.
+                with self.evaluator.readers.use(db_id) as db_reader:
+                    compiler = JSONToSQLCompiler(step_decomposer["json_plan"], optimizer=self.plan_optimizer,
+                                                 db_reader=db_reader, resources=self.semantic_resources,
+                                                 semantic_cache=self.semantic_cache,
+                                                 lexical_threshold=self.lexical_threshold)
+                    generated_sql = compiler.compile()
+                step_compiler["optimizations"] = compiler.optimizations
+            else:
+                compiler = JSONToSQLCompiler(step_decomposer["json_plan"], resources=self.semantic_resources,
+                                             semantic_cache=self.semantic_cache,
+                                             lexical_threshold=self.lexical_threshold)
+                generated_sql = compiler.compile()
+            result["metrics"]["semantic_lexical_hits"] = compiler.semantic_lexical_hits
+            if self.semantic_cache:
+                result["metrics"]["semantic_cache"] = compiler.semantic_cache_stats
             step_compiler["generated_sql"] = generated_sql
             
             if generated_sql.startswith("--"): 
@@ -108,9 +186,32 @@ class BirdSQLPipeline:
             result["metrics"]["total_time"] = time.time() - start_time
             return result
 
+        eval_budget = {}
+        step_plan = None
+        if self.plan_gate:
+            with self.evaluator.readers.use(db_id) as db_reader:
+                step_plan = self.plan_gate.inspect(step_compiler["generated_sql"], db_reader)
+            step_plan["action"] = "execute"
+            if step_plan["cost_class"] == COST_INVALID:
+                step_plan["action"] = "skip"
+            elif step_plan["cost_class"] == COST_HIGH and self.plan_gate_mode == "skip":
+                step_plan["action"] = "skip"
+            elif step_plan["cost_class"] == COST_HIGH and self.plan_gate_mode == "down_budget":
+                step_plan["action"] = "down_budget"
+                eval_budget = self.gated_budget
+            result["steps"]["plan_gate"] = step_plan
+
         step_evaluator = {"status": "pending", "match_type": "N/A"}
         
-        if self.evaluator and ground_truth_sql:
+        if step_plan and step_plan["action"] == "skip" and ground_truth_sql:
+            step_evaluator["status"] = "skipped_plan_gate"
+            if step_plan["cost_class"] == COST_INVALID:
+                step_evaluator["execution_status"] = "SQL_ERROR"
+                step_evaluator["details"] = f"SQL Preparation Failed: {step_plan['error']}"
+            else:
+                step_evaluator["execution_status"] = "SKIPPED"
+                step_evaluator["details"] = "; ".join(step_plan["warnings"])
+        elif self.evaluator and ground_truth_sql:
             try:
                 token_stats = {"total_tokens": result["metrics"]["total_tokens"]}
                 
@@ -119,13 +220,20 @@ class BirdSQLPipeline:
                     natural_language_query=user_query,
                     gt_sql=ground_truth_sql,
                     pred_sql=step_compiler["generated_sql"],
-                    token_stats=token_stats
+                    token_stats=token_stats,
+                    db_id=db_id,
+                    **eval_budget
                 )
                 
                 step_evaluator["status"] = "success"
                 step_evaluator["match_type"] = eval_result.get("match_type", "WRONG")
                 step_evaluator["details"] = eval_result.get("failure_reason")
                 step_evaluator["execution_status"] = eval_result.get("execution_status")
+                if "ves" in eval_result:
+                    step_evaluator["ves"] = eval_result["ves"]
+                    step_evaluator["timing"] = eval_result.get("timing")
+                    if "ves_error" in eval_result:
+                        step_evaluator["ves_error"] = eval_result["ves_error"]
                 
             except Exception as e:
                 step_evaluator["status"] = "error"
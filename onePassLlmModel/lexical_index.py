@@ -0,0 +1,114 @@
+import json
+import os
+import unicodedata
+from collections import Counter
+
+DEFAULT_LEXICAL_INDEX_DIR = "./lexical_index"
+# Fuzzy matches below this Dice similarity are left to the vector search.
+LEXICAL_CONFIDENCE_THRESHOLD = 0.75
+
+
+def fold_text(text):
+    """
+    Case- and accent-insensitive form of a value: "Hl.m. Praha" and "hl.m. praha" fold alike,
+    "Plzeň" folds to "plzen".
+    """
+    decomposed = unicodedata.normalize("NFKD", str(text))
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def trigrams(folded):
+    padded = f"  {folded} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class LexicalIndex:
+    def __init__(self, entries, build_id=None):
+        """
+        Exact and trigram lookup of one column's vocabulary. entries are (text, db_value) pairs:
+        the distinct values themselves and the mapping descriptions that stand for them.
+        """
+        self.build_id = build_id
+        self.texts = []
+        self.db_values = []
+        self.exact = {}
+        self.postings = {}
+        self.trigram_counts = []
+        for text, db_value in entries:
+            folded = fold_text(text)
+            if not folded:
+                continue
+            values = self.exact.setdefault(folded, [])
+            if db_value not in values:
+                values.append(db_value)
+        for folded, values in self.exact.items():
+            if len(values) > 1:
+                # Ambiguous text: never a fuzzy target
+                continue
+            db_value = values[0]
+            entry_id = len(self.texts)
+            self.texts.append(folded)
+            self.db_values.append(db_value)
+            grams = trigrams(folded)
+            self.trigram_counts.append(len(grams))
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(entry_id)
+
+    @classmethod
+    def from_collection_items(cls, documents, metadatas, build_id=None):
+        """
+        Entries of a collection built by VectorDBBuilder: each document and each db_value,
+        plus the description part of mapping texts written as "<db_value>: <description>".
+        """
+        entries = []
+        for document, meta in zip(documents, metadatas):
+            db_value = meta["db_value"]
+            entries.append((db_value, db_value))
+            entries.append((document, db_value))
+            prefix = f"{db_value}: "
+            if isinstance(document, str) and document.startswith(prefix):
+                entries.append((document[len(prefix):], db_value))
+        return cls(entries, build_id)
+
+    def lookup(self, query_text, threshold=LEXICAL_CONFIDENCE_THRESHOLD):
+        """
+        Returns (db_value, confidence): 1.0 for an exact folded match, the trigram Dice similarity
+        of the best fuzzy match otherwise. (None, 0.0) when nothing reaches threshold or the best
+        match is ambiguous between different db values.
+        """
+        folded = fold_text(query_text)
+        if not folded:
+            return None, 0.0
+        values = self.exact.get(folded)
+        if values:
+            return (values[0], 1.0) if len(values) == 1 else (None, 0.0)
+
+        grams = trigrams(folded)
+        overlaps = Counter()
+        for gram in grams:
+            overlaps.update(self.postings.get(gram, ()))
+        best_value, best_score = None, 0.0
+        for entry_id, overlap in overlaps.items():
+            score = 2 * overlap / (len(grams) + self.trigram_counts[entry_id])
+            if score > best_score:
+                best_value, best_score = self.db_values[entry_id], score
+            elif score == best_score and self.db_values[entry_id] != best_value:
+                best_value = None
+        if best_value is None or best_score < threshold:
+            return None, 0.0
+        return best_value, best_score
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "build_id": self.build_id,
+                "entries": [[text, values] for text, values in self.exact.items()]
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return cls([(text, value) for text, values in data["entries"] for value in values], data.get("build_id"))
@@ -0,0 +1,139 @@
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+DEFAULT_NUMPY_INDEX_DIR = "./numpy_index"
+EMBEDDINGS_FILE = "embeddings.npy"
+NORMS_FILE = "norms.npy"
+VALUES_FILE = "values.json"
+CURRENT_FILE = "CURRENT"
+
+
+def read_current(path):
+    """
+    The {"version", "build_id"} pointer of an exported collection directory, or None for an
+    export written before versioning (its files sit directly in path) or a missing one.
+    """
+    try:
+        with open(os.path.join(path, CURRENT_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def export_collection(collection, index_dir=DEFAULT_NUMPY_INDEX_DIR):
+    """
+    Writes a Chroma collection as <index_dir>/<name>/: unit-normalized float32 embeddings and their
+    norms as .npy files, plus a value table (ids, metadatas, documents, build_id) in values.json.
+    Returns the number of exported items.
+
+    Other processes may have the current files memory-mapped, so nothing is overwritten: each
+    export goes to a new version directory, and the CURRENT pointer is switched to it with an
+    atomic os.replace once it is complete. The previous version is kept for readers that resolved
+    the pointer just before the switch; older ones are removed.
+    """
+    data = collection.get(include=["embeddings", "metadatas", "documents"])
+    if data["ids"]:
+        embeddings = np.asarray(data["embeddings"], dtype=np.float32)
+    else:
+        embeddings = np.zeros((0, 0), dtype=np.float32)
+    norms = np.linalg.norm(embeddings, axis=1).astype(np.float32)
+    normalized = embeddings / np.where(norms > 0, norms, 1)[:, None]
+    build_id = (collection.metadata or {}).get("build_id")
+
+    root = os.path.join(index_dir, collection.name)
+    os.makedirs(root, exist_ok=True)
+    path = tempfile.mkdtemp(prefix=f"{build_id or 'export'}_", dir=root)
+    np.save(os.path.join(path, EMBEDDINGS_FILE), normalized.astype(np.float32))
+    np.save(os.path.join(path, NORMS_FILE), norms)
+    with open(os.path.join(path, VALUES_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            "build_id": build_id,
+            "ids": data["ids"],
+            "metadatas": data["metadatas"],
+            "documents": data["documents"]
+        }, f, ensure_ascii=False)
+
+    previous = read_current(root)
+    fd, pointer = tempfile.mkstemp(prefix=".CURRENT_", dir=root)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump({"version": os.path.basename(path), "build_id": build_id}, f)
+    os.replace(pointer, os.path.join(root, CURRENT_FILE))
+
+    keep = {os.path.basename(path), previous["version"] if previous else None}
+    for entry in os.listdir(root):
+        entry_path = os.path.join(root, entry)
+        if entry in keep or entry == CURRENT_FILE:
+            continue
+        if os.path.isdir(entry_path):
+            # Still mapped by a reader on Windows: left for the next export to remove.
+            shutil.rmtree(entry_path, ignore_errors=True)
+        elif entry in (EMBEDDINGS_FILE, NORMS_FILE, VALUES_FILE):
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+    return len(data["ids"])
+
+
+class NumpyKNNCollection:
+    def __init__(self, path, embedding_function=None):
+        """
+        Exact k-nearest-neighbour search over a collection exported by export_collection, answering
+        query() like a Chroma collection. The embeddings are memory-mapped, so opening a collection
+        costs no more than reading its value table.
+        Distances are squared L2 like Chroma's default space, rebuilt from the normalized dot product
+        and the stored norms, so confidences (1 / (1 + d)) agree with the Chroma backend.
+        """
+        self.path = path
+        self.name = os.path.basename(os.path.normpath(path))
+        self.embedding_function = embedding_function
+        current = read_current(path)
+        # The version the handle reads from; a later export switches CURRENT to a new one.
+        self.version = current["version"] if current else None
+        files_dir = os.path.join(path, self.version) if self.version else path
+        with open(os.path.join(files_dir, VALUES_FILE), 'r', encoding='utf-8') as f:
+            values = json.load(f)
+        self.ids = values["ids"]
+        self.metadatas = values["metadatas"]
+        self.documents = values["documents"]
+        self.metadata = {"build_id": values.get("build_id")}
+        self.embeddings = np.load(os.path.join(files_dir, EMBEDDINGS_FILE), mmap_mode="r")
+        self.norms = np.load(os.path.join(files_dir, NORMS_FILE), mmap_mode="r")
+
+    def count(self):
+        return len(self.ids)
+
+    def query(self, query_texts=None, query_embeddings=None, n_results=1):
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts))
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(len(query_embeddings), -1)
+
+        result = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+        k = min(n_results, len(self.ids))
+        if k == 0:
+            for _ in range(len(queries)):
+                for field in result.values():
+                    field.append([])
+            return result
+
+        query_norms = np.linalg.norm(queries, axis=1)
+        # One matrix product for every query; |q - x|^2 = |q|^2 + |x|^2 - 2 |x| (q . x / |x|)
+        dots = queries @ self.embeddings.T
+        norms = np.asarray(self.norms, dtype=np.float32)
+        distances = query_norms[:, None] ** 2 + norms[None, :] ** 2 - 2 * dots * norms[None, :]
+        distances = np.maximum(distances, 0)
+
+        if k < distances.shape[1]:
+            top = np.argpartition(distances, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(distances.shape[1]), (len(queries), 1))
+        for row, candidates in zip(distances, top):
+            order = candidates[np.argsort(row[candidates], kind="stable")]
+            result["ids"].append([self.ids[i] for i in order])
+            result["metadatas"].append([self.metadatas[i] for i in order])
+            result["documents"].append([self.documents[i] for i in order])
+            result["distances"].append([float(row[i]) for i in order])
+        return result
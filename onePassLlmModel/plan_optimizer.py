@@ -0,0 +1,464 @@
+import copy
+import datetime
+import json
+import math
+import re
+
+ARITHMETIC_OPERATORS = ("+", "-", "*", "/", "%")
+# Comparison operator -> the same comparison with its operands swapped.
+FLIPPED_COMPARISONS = {"=": "=", "==": "=", "<": ">", "<=": ">=", ">": "<", ">=": "<="}
+NONDETERMINISTIC_FUNCTIONS = {"RANDOM", "RANDOMBLOB", "CHANGES", "TOTAL_CHANGES", "LAST_INSERT_ROWID"}
+
+# strftime formats that select a calendar period -> length of the matching 'YYYY-MM-DD' prefix.
+PERIOD_FORMATS = {"%Y": 4, "%Y-%m": 7, "%Y-%m-%d": 10}
+_PREFIX_PERIODS = {length: period for period, length in PERIOD_FORMATS.items()}
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+
+_IDENTIFIER = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)'
+_COLUMN_PATTERN = re.compile(rf'^\s*(?:({_IDENTIFIER})\s*\.\s*)?({_IDENTIFIER})\s*$')
+_TABLE_PATTERN = re.compile(rf'^\s*({_IDENTIFIER})(?:\s+(?:AS\s+)?({_IDENTIFIER}))?\s*$', re.IGNORECASE)
+
+
+def _unquote(name):
+    if name[:1] in ('"', '`', '[') and len(name) > 1:
+        return name[1:-1]
+    return name
+
+
+def _literal(node):
+    """
+    (True, value) for a LITERAL node or a bare JSON scalar (plans sometimes inline those), else (False, None).
+    """
+    if isinstance(node, dict):
+        if node.get("type") == "LITERAL":
+            return True, node.get("value")
+        return False, None
+    if isinstance(node, (str, int, float)):
+        return True, node
+    return False, None
+
+
+def _number(node):
+    is_literal, value = _literal(node)
+    if not is_literal or isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _text(node):
+    is_literal, value = _literal(node)
+    if not is_literal or not isinstance(value, str) or value.strip().startswith("("):
+        return None
+    return value
+
+
+def _function_name(node):
+    if isinstance(node, dict) and node.get("type") == "FUNCTION":
+        return str(node.get("name", "")).upper()
+    return None
+
+
+def _period_bounds(period, text):
+    """
+    ('YYYY-MM-DD' start, 'YYYY-MM-DD' start of the next period) for a period value such as
+    '1997' (%Y), '1997-05' (%Y-%m) or '1997-05-03' (%Y-%m-%d); None if text is not one.
+    """
+    if not isinstance(text, str) or len(text) != PERIOD_FORMATS[period]:
+        return None
+    try:
+        if period == "%Y":
+            if not text.isdigit():
+                return None
+            start = datetime.date(int(text), 1, 1)
+            end = datetime.date(start.year + 1, 1, 1)
+        elif period == "%Y-%m":
+            start = datetime.datetime.strptime(text, "%Y-%m").date()
+            end = datetime.date(start.year + start.month // 12, start.month % 12 + 1, 1)
+        else:
+            start = datetime.datetime.strptime(text, "%Y-%m-%d").date()
+            end = start + datetime.timedelta(days=1)
+    except (ValueError, OverflowError):
+        return None
+    # strptime also accepts unpadded values such as '1997-5'; strftime never produces them.
+    if start.isoformat()[:len(text)] != text:
+        return None
+    return start.isoformat(), end.isoformat()
+
+
+def _fold(left, operator, right):
+    """
+    Evaluates numeric literal arithmetic the way SQLite does, or returns None when it would not
+    give the same value: integer division truncates toward zero, % keeps the dividend's sign,
+    and division by zero (NULL in SQLite), integer overflow and non-finite results are left alone.
+    """
+    a, b = _number(left), _number(right)
+    if a is None or b is None:
+        return None
+
+    if isinstance(a, int) and isinstance(b, int):
+        if operator == "+":
+            result = a + b
+        elif operator == "-":
+            result = a - b
+        elif operator == "*":
+            result = a * b
+        else:
+            if b == 0:
+                return None
+            quotient = abs(a) // abs(b)
+            if (a < 0) != (b < 0):
+                quotient = -quotient
+            result = quotient if operator == "/" else a - b * quotient
+        if not _INT64_MIN <= result <= _INT64_MAX:
+            return None
+        return result
+
+    if operator == "%":
+        return None
+    a, b = float(a), float(b)
+    if operator == "/":
+        if b == 0:
+            return None
+        result = a / b
+    elif operator == "+":
+        result = a + b
+    elif operator == "-":
+        result = a - b
+    else:
+        result = a * b
+    return result if math.isfinite(result) else None
+
+
+def _compare(a, operator, b):
+    if operator in ("=", "=="):
+        return a == b
+    if operator in ("!=", "<>"):
+        return a != b
+    if operator == "<":
+        return a < b
+    if operator == "<=":
+        return a <= b
+    if operator == ">":
+        return a > b
+    if operator == ">=":
+        return a >= b
+    return None
+
+
+def _is_tautology(node):
+    """
+    True for a comparison of two literals of the same kind that always holds, e.g. 1 = 1.
+    """
+    if not isinstance(node, dict) or "logic" in node:
+        return False
+    left, right = node.get("left"), node.get("right")
+    a, b = _number(left), _number(right)
+    if a is None or b is None:
+        a, b = _text(left), _text(right)
+        if a is None or b is None:
+            return False
+    return _compare(a, str(node.get("operator", "")).strip(), b) is True
+
+
+def _is_deterministic(node):
+    if isinstance(node, dict):
+        if _function_name(node) in NONDETERMINISTIC_FUNCTIONS:
+            return False
+        return all(_is_deterministic(value) for value in node.values())
+    if isinstance(node, list):
+        return all(_is_deterministic(item) for item in node)
+    return True
+
+
+def _column_leaf(column, operator, value):
+    return {"left": {"type": "COLUMN", "value": column}, "operator": operator, "right": {"type": "LITERAL", "value": value}}
+
+
+class PlanOptimizer:
+    def __init__(self, db_reader):
+        """
+        Rewrites the ConditionNode trees of a decomposer plan before JSONToSQLCompiler emits them:
+          - period filters on date columns become range comparisons an index can use, e.g.
+            strftime('%Y', t.date) = '1995'         -> t.date >= '1995-01-01' AND t.date < '1996-01-01'
+            SUBSTR(t.date, 1, 7) <= '1996-03'        -> t.date < '1996-04-01'
+            CAST(strftime('%Y', t.date) AS INT) > 1996 -> t.date >= '1997-01-01'
+            (=, <, <=, >, >= with a literal on either side)
+          - arithmetic on numeric literals is folded with SQLite's semantics
+          - repeated conjuncts / disjuncts and always-true conjuncts (1 = 1) are dropped
+        The date rewrite is only applied to columns whose every non-NULL value is canonical
+        'YYYY-MM-DD[...]' text (checked once per column against the database), which is what
+        makes the range and the strftime / SUBSTR filter select the same rows.
+        """
+        self.db_reader = db_reader
+        self._schemas = {}
+        self._iso_date_columns = {}
+
+    # --- schema ---
+
+    def _schema(self, db_reader):
+        """
+        {lower-case table: (table, {lower-case column: column})} of a database, loaded once.
+        """
+        if db_reader.db_path not in self._schemas:
+            schema = {}
+            for table in db_reader.table_names():
+                schema[table.lower()] = (table, {col.lower(): col for col in db_reader.table_columns(table)})
+            self._schemas[db_reader.db_path] = schema
+        return self._schemas[db_reader.db_path]
+
+    def _is_iso_date_column(self, db_reader, table, column):
+        key = (db_reader.db_path, table, column)
+        if key not in self._iso_date_columns:
+            # A value passes when it is text whose calendar date, as SQLite parses it, is its own
+            # first ten characters; then strftime / SUBSTR periods and text ranges agree on it.
+            sql = (
+                f'SELECT 1 FROM "{table}" WHERE "{column}" IS NOT NULL AND (typeof("{column}") != \'text\' '
+                f'OR date("{column}") IS NULL OR date("{column}") != substr("{column}", 1, 10)) LIMIT 1'
+            )
+            try:
+                self._iso_date_columns[key] = not any(db_reader.stream_select_query(sql))
+            except Exception:
+                self._iso_date_columns[key] = False
+        return self._iso_date_columns[key]
+
+    def _task_scope(self, task, schema):
+        """
+        {alias or table name (lower-case): lower-case table} for the tables a task reads.
+        """
+        scope = {}
+        tables = [task.get("main_table")]
+        tables += [logic.get("table") for logic in task.get("structural_logic", []) or [] if "JOIN" in str(logic.get("type", ""))]
+        for table_str in tables:
+            match = _TABLE_PATTERN.match(table_str) if isinstance(table_str, str) else None
+            if not match:
+                continue
+            table = _unquote(match.group(1)).lower()
+            if table not in schema:
+                continue
+            scope[table] = table
+            if match.group(2):
+                scope[_unquote(match.group(2)).lower()] = table
+        return scope
+
+    def _resolve_date_column(self, column, ctx):
+        """
+        Returns the column string if it names a verified ISO date column, else None.
+        Qualified names use the task's aliases (or an alias every other task agrees on, for
+        correlated subqueries); a bare name must belong to exactly one table of the task.
+        """
+        match = _COLUMN_PATTERN.match(column) if isinstance(column, str) else None
+        if not match:
+            return None
+        qualifier, name = match.group(1), _unquote(match.group(2)).lower()
+        schema = ctx["schema"]
+
+        if qualifier:
+            qualifier = _unquote(qualifier).lower()
+            table = ctx["scope"].get(qualifier)
+            if table is None:
+                candidates = {scope[qualifier] for scope in ctx["all_scopes"] if qualifier in scope}
+                table = candidates.pop() if len(candidates) == 1 else None
+        else:
+            candidates = {table for table in ctx["scope"].values() if name in schema[table][1]}
+            table = candidates.pop() if len(candidates) == 1 else None
+
+        if table is None or name not in schema[table][1]:
+            return None
+        if not self._is_iso_date_column(ctx["db_reader"], schema[table][0], schema[table][1][name]):
+            return None
+        return column
+
+    # --- rewrites ---
+
+    def _period_expression(self, node):
+        """
+        (column string, period, compares_as_integer) for strftime(<period>, col),
+        SUBSTR(col, 1, 4|7|10) or CAST(strftime('%Y', col) AS INT[EGER]); otherwise None.
+        """
+        name = _function_name(node)
+        params = node.get("params", []) if name else []
+        if name == "STRFTIME" and len(params) == 2:
+            period = _text(params[0])
+            column = params[1]
+            if period in PERIOD_FORMATS and isinstance(column, dict) and column.get("type") == "COLUMN":
+                return column.get("value"), period, False
+        elif name in ("SUBSTR", "SUBSTRING") and len(params) == 3:
+            column, start, length = params
+            if (isinstance(column, dict) and column.get("type") == "COLUMN"
+                    and _number(start) == 1 and isinstance(_number(start), int)
+                    and isinstance(_number(length), int) and _number(length) in _PREFIX_PERIODS):
+                return column.get("value"), _PREFIX_PERIODS[_number(length)], False
+        elif name == "CAST" and len(params) == 2:
+            type_name = _text(params[1])
+            inner = self._period_expression(params[0]) if isinstance(params[0], dict) else None
+            if (type_name and type_name.replace('"', "").strip().upper() in ("INT", "INTEGER")
+                    and inner and inner[1] == "%Y" and not inner[2]):
+                return inner[0], "%Y", True
+        return None
+
+    def _sargable(self, node, ctx):
+        """
+        Range-comparison replacement of a period filter leaf, or None when it does not apply.
+        """
+        operator = str(node.get("operator", "")).strip()
+        if operator not in FLIPPED_COMPARISONS:
+            return None
+
+        left, right = node.get("left"), node.get("right")
+        expression = self._period_expression(left) if isinstance(left, dict) else None
+        literal = right
+        if expression is None:
+            expression = self._period_expression(right) if isinstance(right, dict) else None
+            literal = left
+            operator = FLIPPED_COMPARISONS[operator]
+        if expression is None:
+            return None
+
+        column, period, as_integer = expression
+        if as_integer:
+            # The integer comparison only matches the period text for 4-digit years.
+            year = _number(literal)
+            if not isinstance(year, int) or not 1 <= year <= 9999:
+                return None
+            text = f"{year:04d}"
+        else:
+            text = _text(literal)
+        bounds = _period_bounds(period, text)
+        if bounds is None or self._resolve_date_column(column, ctx) is None:
+            return None
+
+        start, end = bounds
+        if operator in ("=", "=="):
+            return {"logic": "AND", "conditions": [_column_leaf(column, ">=", start), _column_leaf(column, "<", end)]}
+        if operator == "<":
+            return _column_leaf(column, "<", start)
+        if operator == "<=":
+            return _column_leaf(column, "<", end)
+        if operator == ">":
+            return _column_leaf(column, ">=", end)
+        return _column_leaf(column, ">=", start)
+
+    def _value(self, node, ctx):
+        if not isinstance(node, dict):
+            return node
+        v_type = node.get("type")
+
+        if v_type == "FUNCTION":
+            return {**node, "params": [self._value(p, ctx) for p in node.get("params", [])]}
+
+        if v_type == "CASE":
+            optimized = {**node, "cases": [
+                {**case, "when": self._value(case.get("when"), ctx), "then": self._value(case.get("then"), ctx)}
+                for case in node.get("cases", [])
+            ]}
+            if "else" in node:
+                optimized["else"] = self._value(node["else"], ctx)
+            return optimized
+
+        if v_type == "CONDITION" and isinstance(node.get("value"), dict):
+            inner = node["value"]
+            operator = str(inner.get("operator", "")).strip()
+            if "logic" not in inner and operator in ARITHMETIC_OPERATORS:
+                left, right = self._value(inner.get("left"), ctx), self._value(inner.get("right"), ctx)
+                folded = _fold(left, operator, right)
+                if folded is not None:
+                    ctx["report"]["folded_constants"] += 1
+                    return {"type": "LITERAL", "value": folded}
+                return {**node, "value": {**inner, "left": left, "right": right}}
+            return {**node, "value": self._condition(inner, ctx, allow_empty=False)}
+
+        return node
+
+    def _condition(self, node, ctx, allow_empty):
+        """
+        Optimized copy of a ConditionNode. With allow_empty=True, a condition that is always
+        true comes back as None so the caller can drop it.
+        """
+        if not isinstance(node, dict):
+            return node
+        report = ctx["report"]
+
+        if "logic" not in node:
+            leaf = dict(node)
+            if "left" in leaf:
+                leaf["left"] = self._value(leaf["left"], ctx)
+            if "right" in leaf:
+                leaf["right"] = self._value(leaf["right"], ctx)
+            if allow_empty and _is_tautology(leaf):
+                report["tautologies"] += 1
+                return None
+            rewritten = self._sargable(leaf, ctx)
+            if rewritten is not None:
+                report["sargable_rewrites"] += 1
+                return rewritten
+            return leaf
+
+        logic = str(node["logic"]).strip().upper()
+        if logic not in ("AND", "OR"):
+            return {**node, "conditions": [self._condition(c, ctx, allow_empty=False) for c in node.get("conditions", [])]}
+
+        conditions = []
+        for original in node.get("conditions", []):
+            child = self._condition(original, ctx, allow_empty=(logic == "AND"))
+            if child is None:
+                continue
+            # A leaf rewritten into a range joins its parent AND: (a AND (b >= x AND b < y)) -> (a AND b >= x AND b < y).
+            if (logic == "AND" and isinstance(original, dict) and "logic" not in original
+                    and isinstance(child, dict) and child.get("logic") == "AND"):
+                conditions.extend(child["conditions"])
+            else:
+                conditions.append(child)
+
+        kept, seen = [], set()
+        for child in conditions:
+            key = json.dumps(child, sort_keys=True, default=str)
+            if key in seen and _is_deterministic(child):
+                report["duplicate_conjuncts"] += 1
+                continue
+            seen.add(key)
+            kept.append(child)
+
+        if not kept:
+            if allow_empty:
+                return None
+            return {"left": {"type": "LITERAL", "value": 1}, "operator": "=", "right": {"type": "LITERAL", "value": 1}}
+        if len(kept) == 1 and len(node.get("conditions", [])) > 1:
+            return kept[0]
+        return {**node, "conditions": kept}
+
+    def optimize(self, json_plan, db_reader=None):
+        """
+        Returns (optimized copy of json_plan, report of the rewrites applied).
+        The input plan is not modified.
+        """
+        db_reader = db_reader or self.db_reader
+        plan = copy.deepcopy(json_plan)
+        report = {"sargable_rewrites": 0, "folded_constants": 0, "duplicate_conjuncts": 0, "tautologies": 0}
+        tasks = [task for task in plan.get("tasks", []) if isinstance(task, dict)]
+        if not tasks:
+            return plan, report
+
+        schema = self._schema(db_reader)
+        scopes = [self._task_scope(task, schema) for task in tasks]
+        for task, scope in zip(tasks, scopes):
+            ctx = {"db_reader": db_reader, "schema": schema, "scope": scope, "all_scopes": scopes, "report": report}
+
+            for clause in ("where_clause", "having_clause"):
+                if task.get(clause):
+                    task[clause] = self._condition(task[clause], ctx, allow_empty=True)
+
+            for logic in task.get("structural_logic", []) or []:
+                if "JOIN" in str(logic.get("type", "")) and logic.get("condition"):
+                    logic["condition"] = self._condition(logic["condition"], ctx, allow_empty=False)
+
+            for target in task.get("target", []) or []:
+                if isinstance(target, dict) and "value" in target:
+                    target["value"] = self._value(target["value"], ctx)
+            for order in task.get("order_by", []) or []:
+                if isinstance(order, dict) and "value" in order:
+                    order["value"] = self._value(order["value"], ctx)
+
+        return plan, report
@@ -0,0 +1,148 @@
+import re
+
+# Cost classes reported by QueryPlanGate.inspect(), from cheapest to unusable.
+COST_LOW = "LOW"
+COST_MEDIUM = "MEDIUM"
+COST_HIGH = "HIGH"
+COST_INVALID = "INVALID"
+
+_IDENTIFIER = r'(?:"[^"]+"|`[^`]+`|\[[^\]]+\]|\w+)'
+# "FROM t", "JOIN t AS a", ", t a" -> (table, alias). Only names that are real tables are kept.
+_FROM_ITEM_PATTERN = re.compile(
+    rf'(?:\bFROM\b|\bJOIN\b|,)\s*({_IDENTIFIER})(?:\s+(?:AS\s+)?({_IDENTIFIER}))?',
+    re.IGNORECASE
+)
+_NOT_ALIASES = {
+    "on", "using", "where", "group", "order", "limit", "having", "join", "inner", "left",
+    "right", "full", "cross", "natural", "outer", "union", "intersect", "except", "window"
+}
+
+
+def _unquote(name):
+    if name[:1] in ('"', '`', '[') and len(name) > 1:
+        return name[1:-1]
+    return name
+
+
+class QueryPlanGate:
+    def __init__(self, db_reader, big_tables=("trans", "order")):
+        """
+        Static cost check of a SELECT before it is executed.
+        The statement is only prepared under EXPLAIN QUERY PLAN, so syntax and schema errors
+        are caught without running anything. Plans are classified as:
+          INVALID - the statement does not prepare
+          HIGH    - a big table is fully scanned inside another loop (join inner loop or
+                    correlated subquery), i.e. once per outer row
+          MEDIUM  - a big table is fully scanned once, or an automatic index is built on it
+          LOW     - everything else
+        """
+        self.db_reader = db_reader
+        self.big_tables = {name.lower() for name in big_tables}
+        self._tables = {}
+
+    def _table_names(self, db_reader):
+        if db_reader.db_path not in self._tables:
+            self._tables[db_reader.db_path] = {name.lower(): name for name in db_reader.table_names()}
+        return self._tables[db_reader.db_path]
+
+    def _alias_map(self, sql, db_reader):
+        """
+        Maps the names shown in plan rows (aliases or table names) to the set of lower-case table
+        names they stand for. The SQL is not split into scopes, so a name reused for different
+        tables (e.g. "t" in the outer query and in a subquery) maps to all of them.
+        """
+        tables = self._table_names(db_reader)
+        aliases = {}
+        for table, alias in _FROM_ITEM_PATTERN.findall(sql):
+            table = _unquote(table).lower()
+            if table not in tables:
+                continue
+            aliases.setdefault(table, set()).add(table)
+            if alias and alias.lower() not in _NOT_ALIASES:
+                aliases.setdefault(_unquote(alias).lower(), set()).add(table)
+        return aliases
+
+    @staticmethod
+    def _plan_name(words):
+        """
+        The table named by a SCAN/SEARCH plan row and whether it is the table itself (True) or
+        an alias (False). SQLite >= 3.36 prints "SCAN a" (the alias, or the table when there is
+        none); older versions print "SCAN TABLE t AS a" with the real table first.
+        """
+        if words[1] == "TABLE" and len(words) > 2:
+            return _unquote(words[2]).lower(), True
+        return _unquote(words[1]).lower(), False
+
+    def inspect(self, sql, db_reader=None):
+        """
+        Returns {"cost_class", "plan", "warnings", "error"} for a SQL string.
+        db_reader overrides the gate's database (e.g. a question from another BIRD database).
+        """
+        db_reader = db_reader or self.db_reader
+        try:
+            plan = db_reader.explain_query_plan(sql)
+        except Exception as e:
+            return {"cost_class": COST_INVALID, "plan": [], "warnings": [], "error": str(e)}
+
+        aliases = self._alias_map(sql, db_reader)
+        details = {node_id: detail for node_id, _, detail in plan}
+        parents = {node_id: parent for node_id, parent, _ in plan}
+
+        def in_correlated_subquery(node_id):
+            parent = parents.get(node_id, 0)
+            while parent:
+                if details.get(parent, "").startswith("CORRELATED"):
+                    return True
+                parent = parents.get(parent, 0)
+            return False
+
+        warnings = []
+        cost_class = COST_LOW
+        loops_seen = {}
+        for node_id, parent, detail in plan:
+            words = detail.split()
+            if len(words) < 2 or words[0] not in ("SCAN", "SEARCH"):
+                continue
+
+            # Sibling loops under the same parent are nested outer-to-inner in plan order.
+            outer_loops = loops_seen.get(parent, 0)
+            loops_seen[parent] = outer_loops + 1
+
+            name, is_table = self._plan_name(words)
+            candidates = {name} if is_table else aliases.get(name, set())
+            if len(candidates) > 1:
+                # Same alias for different tables in different scopes: which one this loop reads
+                # cannot be told from the plan row, so it is not classified.
+                if candidates & self.big_tables:
+                    warnings.append(f"Ambiguous alias '{name}' ({', '.join(sorted(candidates))}) not classified: {detail}")
+                continue
+            table = next(iter(candidates), None)
+            if table not in self.big_tables:
+                continue
+
+            if words[0] == "SCAN":
+                if outer_loops or in_correlated_subquery(node_id):
+                    warnings.append(f"Nested full scan of '{table}': {detail}")
+                    cost_class = COST_HIGH
+                else:
+                    warnings.append(f"Full scan of '{table}': {detail}")
+                    if cost_class == COST_LOW:
+                        cost_class = COST_MEDIUM
+            elif "AUTOMATIC" in detail:
+                warnings.append(f"Automatic index built on '{table}': {detail}")
+                if cost_class == COST_LOW:
+                    cost_class = COST_MEDIUM
+
+        # Indented like the sqlite3 shell's .eqp output so nesting survives in the JSON logs.
+        depths = {0: -1}
+        plan_lines = []
+        for node_id, parent, detail in plan:
+            depths[node_id] = depths.get(parent, -1) + 1
+            plan_lines.append("  " * depths[node_id] + detail)
+
+        return {
+            "cost_class": cost_class,
+            "plan": plan_lines,
+            "warnings": warnings,
+            "error": None
+        }
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_SEMANTIC_CACHE_PATH = os.path.join(BASE_DIR, ".cache", "semantic_resolutions.sqlite")
+
+
+def normalize_query_text(text):
+    """
+    Collapses whitespace only. Case is kept: the multilingual MiniLM tokenizer is case-sensitive,
+    so "Prague" and "prague" can resolve differently.
+    """
+    return " ".join(str(text).split())
+
+
+class SemanticCache:
+    def __init__(self, cache_path=DEFAULT_SEMANTIC_CACHE_PATH, max_entries=4096):
+        """
+        Resolved SEMANTIC values (db values and best confidence) keyed by
+        (collection, build id, normalized text, operator, n_results, threshold).
+        An in-memory LRU of max_entries sits in front of an on-disk SQLite store shared across runs.
+        The build id is the one VectorDBBuilder stores in the collection metadata, so entries of a
+        rebuilt collection are never returned; the first lookup of a new build drops them from disk.
+        """
+        self.cache_path = cache_path
+        self.max_entries = max_entries
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._memory = OrderedDict()
+        self._build_ids = {}
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+        self.conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS resolutions (
+                collection TEXT NOT NULL,
+                build_id TEXT NOT NULL,
+                key_hash TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                PRIMARY KEY (collection, key_hash)
+            )
+        """)
+        self.conn.commit()
+
+    @staticmethod
+    def make_key(collection, build_id, query_text, operator, n_results, threshold):
+        return (collection, build_id or "", normalize_query_text(query_text), str(operator), n_results, threshold)
+
+    @staticmethod
+    def _key_hash(key):
+        return hashlib.sha1(json.dumps(key[1:], ensure_ascii=False).encode('utf-8')).hexdigest()
+
+    def _register_build(self, collection, build_id):
+        # Called with the lock held.
+        if self._build_ids.get(collection) == build_id:
+            return
+        self._build_ids[collection] = build_id
+        try:
+            self.conn.execute(
+                "DELETE FROM resolutions WHERE collection = ? AND build_id != ?",
+                (collection, build_id)
+            )
+            self.conn.commit()
+        except sqlite3.OperationalError as e:
+            print(f"Semantic cache cleanup skipped: {e}")
+
+    def get(self, key):
+        """
+        Returns ((values, confidence), source) with source "memory" or "disk", or (None, None).
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry, "memory"
+
+            self._register_build(key[0], key[1])
+            row = self.conn.execute(
+                "SELECT payload FROM resolutions WHERE collection = ? AND key_hash = ?",
+                (key[0], self._key_hash(key))
+            ).fetchone()
+            if row is None:
+                self.stats["misses"] += 1
+                return None, None
+            data = json.loads(row[0])
+            entry = (data["values"], data["confidence"])
+            self._remember(key, entry)
+            self.stats["disk_hits"] += 1
+            return entry, "disk"
+
+    def put(self, key, values, confidence):
+        entry = (list(values), confidence)
+        payload = json.dumps({"values": entry[0], "confidence": confidence}, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, entry)
+            try:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO resolutions (collection, build_id, key_hash, payload) VALUES (?, ?, ?, ?)",
+                    (key[0], key[1], self._key_hash(key), payload)
+                )
+                self.conn.commit()
+            except sqlite3.OperationalError as e:
+                # A busy cache must never fail a compilation.
+                print(f"Semantic cache write skipped: {e}")
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def invalidate(self, collection=None):
+        """
+        Drops every entry of a collection (or of all collections), in memory and on disk.
+        """
+        with self._lock:
+            if collection is None:
+                self._memory.clear()
+                self._build_ids.clear()
+                self.conn.execute("DELETE FROM resolutions")
+            else:
+                for key in [k for k in self._memory if k[0] == collection]:
+                    del self._memory[key]
+                self._build_ids.pop(collection, None)
+                self.conn.execute("DELETE FROM resolutions WHERE collection = ?", (collection,))
+            self.conn.commit()
+
+    def hit_rate(self):
+        lookups = sum(self.stats.values())
+        return (self.stats["memory_hits"] + self.stats["disk_hits"]) / lookups if lookups else 0.0
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,172 @@
+import os
+import threading
+import time
+import chromadb
+from chromadb.utils import embedding_functions
+from onePassLlmModel.numpy_knn import NumpyKNNCollection, DEFAULT_NUMPY_INDEX_DIR, read_current
+from onePassLlmModel.lexical_index import LexicalIndex, DEFAULT_LEXICAL_INDEX_DIR
+
+DEFAULT_VECTOR_DB_PATH = "./chroma_db"
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+SEMANTIC_BACKENDS = ("chroma", "numpy")
+# How long a cached handle is trusted before refresh() checks the store for a rebuild again.
+DEFAULT_BUILD_CHECK_SECONDS = 1.0
+
+
+class SemanticResources:
+    def __init__(self, vector_db_path=DEFAULT_VECTOR_DB_PATH, model_name=DEFAULT_EMBEDDING_MODEL,
+                 backend="chroma", index_dir=DEFAULT_NUMPY_INDEX_DIR, embedding_function=None,
+                 lexical_index_dir=DEFAULT_LEXICAL_INDEX_DIR, build_check_seconds=DEFAULT_BUILD_CHECK_SECONDS):
+        """
+        The Chroma client, the sentence-transformer embedding function and the collection handles
+        behind semantic search, shared by every compiler of a process. Each one is created on first
+        use (loading MiniLM takes seconds) and then reused; creation is guarded by a lock, so
+        concurrent compilers never load the model or open the store twice.
+        backend: "chroma" queries the Chroma store; "numpy" answers from the exact-kNN export in
+        index_dir (see numpy_knn.py) and never opens the Chroma client.
+        embedding_function: an already loaded embedding function to reuse instead of loading model_name.
+        lexical_index_dir: where VectorDBBuilder writes the per-collection LexicalIndex files.
+        build_check_seconds: minimum interval between two refresh() checks of the same collection.
+        """
+        if backend not in SEMANTIC_BACKENDS:
+            raise ValueError(f"Unknown semantic backend: {backend}")
+        self.vector_db_path = vector_db_path
+        self.model_name = model_name
+        self.backend = backend
+        self.index_dir = index_dir
+        self.lexical_index_dir = lexical_index_dir
+        self.build_check_seconds = build_check_seconds
+        self._lock = threading.RLock()
+        self._client = None
+        self._embedding_function = embedding_function
+        self._collections = {}
+        self._lexical_indexes = {}
+        self._lexical_mtimes = {}
+        self._checked = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = chromadb.PersistentClient(path=self.vector_db_path)
+        return self._client
+
+    @property
+    def embedding_function(self):
+        if self._embedding_function is None:
+            with self._lock:
+                if self._embedding_function is None:
+                    self._embedding_function = embedding_functions.SentenceTransformerEmbeddingFunction(
+                        model_name=self.model_name
+                    )
+        return self._embedding_function
+
+    def get_collection(self, name):
+        """
+        Cached handle of a collection; raises like chromadb when it does not exist.
+        """
+        collection = self._collections.get(name)
+        if collection is None:
+            with self._lock:
+                collection = self._collections.get(name)
+                if collection is None:
+                    if self.backend == "numpy":
+                        collection = NumpyKNNCollection(os.path.join(self.index_dir, name), self.embedding_function)
+                    else:
+                        collection = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+                    self._collections[name] = collection
+        return collection
+
+    def get_lexical_index(self, name):
+        """
+        Cached LexicalIndex of a collection, or None when none was built for it.
+        Loading one never touches the embedding model or the vector store.
+        """
+        index = self._lexical_indexes.get(name)
+        if index is None and name not in self._lexical_indexes:
+            with self._lock:
+                if name not in self._lexical_indexes:
+                    path = self._lexical_path(name)
+                    mtime = self._lexical_mtime(name)
+                    self._lexical_indexes[name] = LexicalIndex.load(path) if mtime is not None else None
+                    self._lexical_mtimes[name] = mtime
+                index = self._lexical_indexes[name]
+        return index
+
+    def _lexical_path(self, name):
+        return os.path.join(self.lexical_index_dir, f"{name}.json")
+
+    def _lexical_mtime(self, name):
+        try:
+            return os.stat(self._lexical_path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _is_stale(self, name, collection):
+        """
+        Whether the store holds a newer build of a collection than the cached handle.
+        """
+        if self.backend == "numpy":
+            current = read_current(collection.path)
+            # Exports written before versioning have no pointer and cannot be told apart.
+            return current is not None and current["version"] != collection.version
+        try:
+            stored = self.client.get_collection(name=name, embedding_function=self.embedding_function)
+        except Exception:
+            return True
+        return (stored.metadata or {}).get("build_id") != (collection.metadata or {}).get("build_id")
+
+    def refresh(self, name):
+        """
+        Drops the cached handle and lexical index of a collection that was rebuilt since they were
+        loaded, e.g. by VectorDBBuilder in another process, so the next get_collection() returns the
+        current build and its build_id keys the semantic cache. Checks the store at most once per
+        build_check_seconds per collection.
+        """
+        now = time.monotonic()
+        checked = self._checked.get(name)
+        if checked is not None and now - checked < self.build_check_seconds:
+            return
+        with self._lock:
+            self._checked[name] = now
+            if name in self._lexical_indexes and self._lexical_mtime(name) != self._lexical_mtimes.get(name):
+                self._lexical_indexes.pop(name, None)
+            collection = self._collections.get(name)
+            if collection is not None and self._is_stale(name, collection):
+                self._collections.pop(name, None)
+
+    def invalidate(self, name=None):
+        """
+        Drops the cached handle of one collection (or all of them), e.g. after it was rebuilt.
+        """
+        with self._lock:
+            if name is None:
+                self._collections.clear()
+                self._lexical_indexes.clear()
+                self._checked.clear()
+            else:
+                self._collections.pop(name, None)
+                self._lexical_indexes.pop(name, None)
+                self._checked.pop(name, None)
+
+
+_shared_resources = {}
+_shared_lock = threading.Lock()
+
+
+def get_semantic_resources(vector_db_path=DEFAULT_VECTOR_DB_PATH, model_name=DEFAULT_EMBEDDING_MODEL,
+                           backend="chroma", index_dir=DEFAULT_NUMPY_INDEX_DIR,
+                           lexical_index_dir=DEFAULT_LEXICAL_INDEX_DIR):
+    """
+    Process-wide SemanticResources per vector store, model and backend, used by the compiler, the
+    pipeline, the Streamlit app and the vector DB builder.
+    """
+    key = (os.path.abspath(vector_db_path), model_name, backend, os.path.abspath(index_dir),
+           os.path.abspath(lexical_index_dir))
+    with _shared_lock:
+        resources = _shared_resources.get(key)
+        if resources is None:
+            resources = _shared_resources[key] = SemanticResources(vector_db_path, model_name, backend, index_dir,
+                                                                   lexical_index_dir=lexical_index_dir)
+        return resources
@@ -3,18 +3,56 @@ import os
  
 sys.path.append(os.getcwd())
 from onePassLlmModel.gpt_ai_engine import GptQueryDecomposer
-import chromadb
-from chromadb.utils import embedding_functions
+from onePassLlmModel.semantic_resources import get_semantic_resources
+from onePassLlmModel.lexical_index import LEXICAL_CONFIDENCE_THRESHOLD
+
+# Further candidates of an IN / NOT IN value are accepted above this confidence.
+SET_CONFIDENCE_THRESHOLD = 0.7
 
 class JSONToSQLCompiler:
-    def __init__(self, json_data, vector_db_path="./chroma_db"):
+    def __init__(self, json_data, vector_db_path="./chroma_db", optimizer=None, db_reader=None, resources=None,
+                 semantic_cache=None, semantic_backend="chroma", lexical_threshold=LEXICAL_CONFIDENCE_THRESHOLD):
+        """
+        optimizer: an optional PlanOptimizer. When given, the plan's condition trees are
+        rewritten (index-friendly date ranges, folded constants, no repeated or always-true
+        conjuncts) against db_reader (default: the optimizer's reader) before compilation.
+        resources: the SemanticResources used by semantic_search; by default the process-wide
+        ones for vector_db_path and semantic_backend ("chroma", or "numpy" for the exact-kNN export
+        written by VectorDBBuilder), so compilers share one model, client and set of collections.
+        semantic_cache: an optional SemanticCache consulted before each vector query; the lookups
+        of this compiler are counted in semantic_cache_stats.
+        lexical_threshold: SEMANTIC values that match a column value or mapping description exactly
+        (case/accent-folded) or by trigram similarity at least this high are resolved from the
+        column's LexicalIndex without any embedding (None: always use the vector search).
+        """
+        self.optimizations = None
+        self._original_tasks = None
+        if optimizer is not None:
+            try:
+                optimized, self.optimizations = optimizer.optimize(json_data, db_reader)
+                self._original_tasks = {t['task_id']: t for t in json_data.get('tasks', [])}
+                json_data = optimized
+            except Exception as e:
+                # A plan the optimizer cannot handle is compiled as it is.
+                print(f"Plan Optimizer Error: {e}")
         self.data = json_data
         # Map task_id to task object for easy lookup
         self.tasks = {t['task_id']: t for t in self.data.get('tasks', [])}
-        self.chroma_client = chromadb.PersistentClient(path=vector_db_path)
-        self.emb_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+        self.resources = resources or get_semantic_resources(vector_db_path, backend=semantic_backend)
+        self.semantic_cache = semantic_cache
+        self.semantic_cache_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self.lexical_threshold = lexical_threshold
+        self.semantic_lexical_hits = 0
+        # (table, column, value, operator) -> (SQL of the resolved values or None, confidence)
+        self._semantic_resolutions = {}
+
+    @property
+    def chroma_client(self):
+        return self.resources.client
+
+    @property
+    def emb_fn(self):
+        return self.resources.embedding_function
 
     def compile(self):
         """
@@ -24,6 +62,7 @@ class JSONToSQLCompiler:
             return "-- No tasks found"
         
         root_task_id = self._find_root_task()
+        self.resolve_semantic_values()
         return self._compile_task(root_task_id)
     
     def _quote_table_string(self, table_str):
@@ -162,6 +201,16 @@ class JSONToSQLCompiler:
         
         return base_sql
 
+    def _compile_unoptimized_task(self, task_id):
+        """
+        Compiles a task from the plan as it was before optimization.
+        """
+        tasks, self.tasks = self.tasks, self._original_tasks
+        try:
+            return self._compile_task(task_id)
+        finally:
+            self.tasks = tasks
+
     def _build_select(self, target_list, current_task):
         """Builds the SELECT clause."""
         columns = []
@@ -233,8 +282,13 @@ class JSONToSQLCompiler:
             right = self._parse_value_node(node['right'], current_task, operator)
 
             # Is the right value a list (semantic search result)
-            right_str = str(right).strip().upper()
-            is_list_format = "," in str(right) and str(right).strip().startswith("(")
+            list_check = right
+            right_node = node['right']
+            if self._original_tasks is not None and isinstance(right_node, dict) and right_node.get('type') == 'SUBQUERY':
+                # Decided on the subquery as written, so an optimized plan never switches between = and IN.
+                list_check = f"({self._compile_unoptimized_task(right_node.get('target_task_id'))})"
+            right_str = str(list_check).strip().upper()
+            is_list_format = "," in str(list_check) and str(list_check).strip().startswith("(")
             is_subquery = right_str.startswith("(SELECT") or right_str.startswith("SELECT")
             if is_list_format and is_subquery:
                 if operator == "=":
@@ -306,7 +360,11 @@ class JSONToSQLCompiler:
         elif v_type == 'SEMANTIC':
             # Pass operator to decide on Scalar vs List return
             # print(f"Semantic Search for: Table={node.get('table')}, Column={node.get('column')}, Value={value}")
-            db_val, _ = self.semantic_search(node.get('table'), node.get('column'), value, parent_operator)
+            key = (node.get('table'), node.get('column'), value, parent_operator)
+            if self._is_batchable(key) and key in self._semantic_resolutions:
+                db_val, _ = self._semantic_resolutions[key]
+            else:
+                db_val, _ = self.semantic_search(node.get('table'), node.get('column'), value, parent_operator)
             if db_val is None:
                 return f"'{value}'"  
             return db_val
@@ -329,53 +387,215 @@ class JSONToSQLCompiler:
         set_compatible_ops = ["IN", "NOT IN"]
         return_more_then_one = parent_operator in set_compatible_ops
         try:
-            collection = self.chroma_client.get_collection(
-                name=collection_name,
-                embedding_function=self.emb_fn
-            )
-            
-            results = collection.query(
-                query_texts=[query_text],
-                n_results=n_results
-            )
-            
-            if not results['metadatas'][0]:
-                return None, 0.0
-            
-            accepted_values = []
-            best_confidence = 0.0
-            
-
-            num_candidates = len(results['metadatas'][0])
-
-            for i in range(num_candidates):
-                meta = results['metadatas'][0][i]
-                distance = results['distances'][0][i]
-                
-                confidence = 1 / (1 + distance)
-                
-                db_val = meta['db_value']
+            # A rebuild in another process must not leave the handle's build_id keying the cache.
+            self.resources.refresh(collection_name)
+            lexical = self._lexical_lookup(collection_name, query_text)
+            if lexical is not None:
+                return self._resolution(*lexical)
+
+            collection = self.resources.get_collection(collection_name)
+
+            cache_key, cached = None, None
+            if self.semantic_cache is not None:
+                build_id = (collection.metadata or {}).get("build_id")
+                cache_key = self.semantic_cache.make_key(collection_name, build_id, query_text, parent_operator,
+                                                         n_results, SET_CONFIDENCE_THRESHOLD)
+                cached, source = self.semantic_cache.get(cache_key)
+                self.semantic_cache_stats[f"{source}_hits" if source else "misses"] += 1
+
+            if cached is not None:
+                accepted_values, best_confidence = cached
+            else:
+                results = collection.query(
+                    query_texts=[query_text],
+                    n_results=n_results
+                )
+                accepted_values, best_confidence = self._accept_candidates(results, return_more_then_one)
+                if cache_key is not None:
+                    self.semantic_cache.put(cache_key, accepted_values, best_confidence)
 
-                if i == 0:
-                    best_confidence = confidence
-                    accepted_values.append(db_val)
-                
-                elif return_more_then_one and confidence > 0.7:
-                    if db_val not in accepted_values:
-                        accepted_values.append(db_val)
             if not accepted_values:
                     return None, 0.0
-            formatted_list = []
-            for val in accepted_values:
-                if isinstance(val, str):
-                    formatted_list.append(f"'{val}'")
-                else:
-                    formatted_list.append(str(val))
-            final_sql_string = ", ".join(formatted_list)
-            return final_sql_string, best_confidence
+            return self._format_db_values(accepted_values), best_confidence
         except Exception as e:
             print(f"Vector Search Error ({collection_name}) ({query_text}): {e}")
+            # The handle may be stale (collection rebuilt by VectorDBBuilder); fetch it again next time.
+            self.resources.invalidate(collection_name)
+            return None, 0.0
+
+    def resolve_semantic_values(self, n_results=1):
+        """
+        Resolves every SEMANTIC node of the plan up front: the distinct (table, column, value, operator)
+        requests are matched against the columns' lexical indexes, then looked up in the semantic cache;
+        the remaining texts are embedded in one batch and
+        each collection is queried once with all of its texts. _parse_value_node then reads the results.
+        """
+        requests = []
+        tasks = list(self.tasks.values())
+        if self._original_tasks is not None:
+            tasks += list(self._original_tasks.values())
+        for task in tasks:
+            self._collect_semantic_nodes(task, "", requests)
+        requests = [key for key in dict.fromkeys(requests) if key not in self._semantic_resolutions]
+        if not requests:
+            return
+
+        by_collection = {}
+        for key in requests:
+            by_collection.setdefault(f"{key[0]}_{key[1]}", []).append(key)
+
+        pending = {}
+        for collection_name, keys in by_collection.items():
+            self.resources.refresh(collection_name)
+            unresolved = []
+            for key in keys:
+                lexical = self._lexical_lookup(collection_name, key[2])
+                if lexical is not None:
+                    self._semantic_resolutions[key] = self._resolution(*lexical)
+                else:
+                    unresolved.append(key)
+            keys = unresolved
+            if not keys:
+                continue
+            try:
+                collection = self.resources.get_collection(collection_name)
+            except Exception as e:
+                print(f"Vector Search Error ({collection_name}) ({', '.join(str(k[2]) for k in keys)}): {e}")
+                for key in keys:
+                    self._semantic_resolutions[key] = (None, 0.0)
+                continue
+            build_id = (collection.metadata or {}).get("build_id")
+            for key in keys:
+                cached = None
+                if self.semantic_cache is not None:
+                    cache_key = self.semantic_cache.make_key(collection_name, build_id, key[2], key[3],
+                                                             n_results, SET_CONFIDENCE_THRESHOLD)
+                    cached, source = self.semantic_cache.get(cache_key)
+                    self.semantic_cache_stats[f"{source}_hits" if source else "misses"] += 1
+                if cached is not None:
+                    self._semantic_resolutions[key] = self._resolution(*cached)
+                else:
+                    pending.setdefault(collection_name, (collection, build_id, []))[2].append(key)
+        if not pending:
+            return
+
+        texts = list(dict.fromkeys(key[2] for _, _, keys in pending.values() for key in keys))
+        try:
+            embeddings = dict(zip(texts, self.emb_fn(texts)))
+        except Exception as e:
+            # Leave the pending nodes to semantic_search, one query each.
+            print(f"Embedding Error ({', '.join(texts)}): {e}")
+            return
+
+        for collection_name, (collection, build_id, keys) in pending.items():
+            collection_texts = list(dict.fromkeys(key[2] for key in keys))
+            try:
+                results = collection.query(
+                    query_embeddings=[embeddings[text] for text in collection_texts],
+                    n_results=n_results
+                )
+            except Exception as e:
+                print(f"Vector Search Error ({collection_name}) ({', '.join(collection_texts)}): {e}")
+                self.resources.invalidate(collection_name)
+                for key in keys:
+                    self._semantic_resolutions[key] = (None, 0.0)
+                continue
+            for key in keys:
+                i = collection_texts.index(key[2])
+                text_results = {'metadatas': [results['metadatas'][i]], 'distances': [results['distances'][i]]}
+                accepted_values, best_confidence = self._accept_candidates(text_results, key[3] in ["IN", "NOT IN"])
+                if self.semantic_cache is not None:
+                    cache_key = self.semantic_cache.make_key(collection_name, build_id, key[2], key[3],
+                                                             n_results, SET_CONFIDENCE_THRESHOLD)
+                    self.semantic_cache.put(cache_key, accepted_values, best_confidence)
+                self._semantic_resolutions[key] = self._resolution(accepted_values, best_confidence)
+
+    def _lexical_lookup(self, collection_name, query_text):
+        """
+        ([db value], confidence) from the column's LexicalIndex, or None to use the vector search.
+        """
+        if self.lexical_threshold is None:
+            return None
+        try:
+            index = self.resources.get_lexical_index(collection_name)
+        except Exception as e:
+            print(f"Lexical Index Error ({collection_name}): {e}")
+            return None
+        if index is None:
+            return None
+        db_value, confidence = index.lookup(query_text, self.lexical_threshold)
+        if db_value is None:
+            return None
+        self.semantic_lexical_hits += 1
+        return [db_value], confidence
+
+    def _collect_semantic_nodes(self, node, parent_operator, requests):
+        """
+        Walks a task like the parsers do: only the two sides of a comparison see its operator.
+        """
+        if isinstance(node, list):
+            for item in node:
+                self._collect_semantic_nodes(item, "", requests)
+        elif isinstance(node, dict):
+            if node.get('type') == 'SEMANTIC':
+                key = (node.get('table'), node.get('column'), node.get('value'), parent_operator)
+                if self._is_batchable(key):
+                    requests.append(key)
+            elif 'logic' not in node and 'operator' in node and ('left' in node or 'right' in node):
+                self._collect_semantic_nodes(node.get('left'), node['operator'], requests)
+                self._collect_semantic_nodes(node.get('right'), node['operator'], requests)
+            else:
+                for item in node.values():
+                    self._collect_semantic_nodes(item, "", requests)
+
+    @staticmethod
+    def _is_batchable(key):
+        return all(isinstance(part, str) for part in key)
+
+    def _resolution(self, accepted_values, best_confidence):
+        if not accepted_values:
             return None, 0.0
+        return self._format_db_values(accepted_values), best_confidence
+
+    @staticmethod
+    def _format_db_values(accepted_values):
+        formatted_list = []
+        for val in accepted_values:
+            if isinstance(val, str):
+                formatted_list.append(f"'{val}'")
+            else:
+                formatted_list.append(str(val))
+        return ", ".join(formatted_list)
+
+    @staticmethod
+    def _accept_candidates(results, return_more_then_one):
+        """
+        The closest candidate always, further ones only for set operators and above the threshold.
+        Returns (db values, confidence of the closest candidate).
+        """
+        accepted_values = []
+        best_confidence = 0.0
+        if not results['metadatas'][0]:
+            return accepted_values, best_confidence
+
+        num_candidates = len(results['metadatas'][0])
+
+        for i in range(num_candidates):
+            meta = results['metadatas'][0][i]
+            distance = results['distances'][0][i]
+            
+            confidence = 1 / (1 + distance)
+            
+            db_val = meta['db_value']
+
+            if i == 0:
+                best_confidence = confidence
+                accepted_values.append(db_val)
+            
+            elif return_more_then_one and confidence > SET_CONFIDENCE_THRESHOLD:
+                if db_val not in accepted_values:
+                    accepted_values.append(db_val)
+        return accepted_values, best_confidence
         
     def _mock_semantic_search(self, search_term, table, column, operator):        
         """Simulates Vector DB retrieval."""
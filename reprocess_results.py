@@ -3,11 +3,22 @@ import os
 import argparse
 from tqdm import tqdm
 from onePassLlmModel.sql_compiler import JSONToSQLCompiler
+from onePassLlmModel.plan_optimizer import PlanOptimizer
+from onePassLlmModel.semantic_resources import get_semantic_resources
+from onePassLlmModel.semantic_cache import SemanticCache
+from onePassLlmModel.lexical_index import LEXICAL_CONFIDENCE_THRESHOLD
 from bird_evaluator import BirdEvaluator
+from bird_db_reader import scaled_filename
 
 def update_stats(stats, res):
     stats["total"] += 1
     status = res.get("status")
+
+    stats["semantic_lexical_hits"] += res.get("metrics", {}).get("semantic_lexical_hits", 0)
+    semantic_cache = res.get("metrics", {}).get("semantic_cache")
+    if semantic_cache:
+        stats["semantic_cache_lookups"] += sum(semantic_cache.values())
+        stats["semantic_cache_hits"] += semantic_cache["memory_hits"] + semantic_cache["disk_hits"]
     
     if status == "filtered_by_router":
         stats["router_filtered"] += 1
@@ -29,8 +40,12 @@ def update_stats(stats, res):
             elif match_type == "SUPER_SOFT_MATCH":
                 stats["super_soft_match"] += 1
                 stats["success"] += 1
+            elif res["steps"]["evaluator"].get("execution_status") == "TIMEOUT":
+                stats["timeouts"] += 1
             else:
                 stats["wrong"] += 1
+            if res["steps"]["evaluator"].get("ves") is not None:
+                stats["ves_sum"] += res["steps"]["evaluator"]["ves"]
         else:
             stats["errors"] += 1
     else:
@@ -43,13 +58,52 @@ def main():
     parser.add_argument("--error_file", type=str, default="results/pipeline_test_report_gpt_errors.jsonl")
     parser.add_argument("--stats_file", type=str, default="results/pipeline_test_report_summary_2.json")
     parser.add_argument("--db_path", type=str, default="financial.sqlite")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall-clock budget (seconds) per predicted query")
+    parser.add_argument("--max_vm_steps", type=int, default=None, help="SQLite VM-step budget per predicted query")
+    parser.add_argument("--accelerated", action="store_true", help="Read from the indexed copy built by build_accelerated_db.py")
+    parser.add_argument("--db_mode", type=str, default="file", choices=["file", "memory", "mmap"],
+                        help="Serve queries from the file, an in-memory copy or a memory-mapped file")
+    parser.add_argument("--memory_limit_mb", type=int, default=2048, help="Largest database copied into memory")
+    parser.add_argument("--efficiency_runs", type=int, default=0,
+                        help="Re-run matching predictions and their GT this many times to compute VES (0: off)")
+    parser.add_argument("--isolated_workers", type=int, default=0,
+                        help="Run predicted SQL in this many memory-capped worker processes (0: in-process)")
+    parser.add_argument("--worker_memory_mb", type=int, default=1024, help="Memory cap of each SQL worker process")
+    parser.add_argument("--typed_normalization", action="store_true",
+                        help="Render each result cell by its own SQLite type instead of like the original pandas "
+                             "path (INTEGER columns with NULLs as floats); can change verdicts")
+    parser.add_argument("--optimize_plans", action="store_true",
+                        help="Rewrite plan conditions into index-friendly, simplified form before compiling")
+    parser.add_argument("--semantic_backend", type=str, default="chroma", choices=["chroma", "numpy"],
+                        help="Resolve SEMANTIC values with Chroma or with the exact NumPy kNN export")
+    parser.add_argument("--no_lexical_fast_path", action="store_true",
+                        help="Resolve every SEMANTIC value by vector search, even exact or near-exact database values")
+    parser.add_argument("--no_semantic_cache", action="store_true",
+                        help="Resolve every SEMANTIC value with a vector query instead of the semantic cache")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Evaluate on the <db>_x<scale>.sqlite copy built by scale_financial_db.py (1: the original)")
     args = parser.parse_args()
 
     if not os.path.exists(args.input_file):
         print(f"Error file not found -> {args.input_file}")
         return
 
-    evaluator = BirdEvaluator(db_filename=args.db_path)
+    evaluator = BirdEvaluator(
+        db_filename=scaled_filename(args.db_path, args.scale),
+        timeout_seconds=args.timeout,
+        max_vm_steps=args.max_vm_steps,
+        prefer_accelerated=args.accelerated,
+        db_mode=args.db_mode,
+        memory_limit_mb=args.memory_limit_mb,
+        efficiency_runs=args.efficiency_runs,
+        isolated_workers=args.isolated_workers,
+        worker_memory_limit_mb=args.worker_memory_mb,
+        typed_normalization=args.typed_normalization
+    )
+    optimizer = PlanOptimizer(evaluator.db_reader) if args.optimize_plans else None
+    resources = get_semantic_resources(backend=args.semantic_backend)
+    semantic_cache = None if args.no_semantic_cache else SemanticCache()
+    lexical_threshold = None if args.no_lexical_fast_path else LEXICAL_CONFIDENCE_THRESHOLD
 
     stats = {
         "total": 0,
@@ -59,9 +113,14 @@ def main():
         "soft_match": 0,
         "super_soft_match": 0,
         "wrong": 0,
+        "timeouts": 0,
         "errors": 0,
         "router_filtered": 0,
-        "total_tokens": 0
+        "total_tokens": 0,
+        "ves_sum": 0.0,
+        "semantic_lexical_hits": 0,
+        "semantic_cache_lookups": 0,
+        "semantic_cache_hits": 0
     }
 
     with open(args.input_file, 'r', encoding='utf-8') as fin, \
@@ -104,8 +163,21 @@ def main():
             generated_sql = None
             
             try:
-                compiler = JSONToSQLCompiler(json_plan)
-                generated_sql = compiler.compile()
+                if optimizer:
+                    # The reader stays pinned until compilation is done, so the LRU cannot close it meanwhile.
+                    with evaluator.readers.use(data.get("db_id") or evaluator.default_db_id) as db_reader:
+                        compiler = JSONToSQLCompiler(json_plan, optimizer=optimizer, db_reader=db_reader,
+                                                     resources=resources, semantic_cache=semantic_cache,
+                                                     lexical_threshold=lexical_threshold)
+                        generated_sql = compiler.compile()
+                    step_compiler["optimizations"] = compiler.optimizations
+                else:
+                    compiler = JSONToSQLCompiler(json_plan, resources=resources, semantic_cache=semantic_cache,
+                                                 lexical_threshold=lexical_threshold)
+                    generated_sql = compiler.compile()
+                data.setdefault("metrics", {})["semantic_lexical_hits"] = compiler.semantic_lexical_hits
+                if semantic_cache:
+                    data.setdefault("metrics", {})["semantic_cache"] = compiler.semantic_cache_stats
                 step_compiler["generated_sql"] = generated_sql
                 
                 if generated_sql and generated_sql.strip().startswith("--"):
@@ -132,7 +204,8 @@ def main():
                         natural_language_query=nl_query,
                         gt_sql=gt_sql,
                         pred_sql=generated_sql,
-                        token_stats=token_stats
+                        token_stats=token_stats,
+                        db_id=data.get("db_id")
                     )
                     step_evaluator = eval_res
                     data["status"] = "completed"
@@ -156,6 +229,16 @@ def main():
             if data.get("status") != "completed" or not is_success:
                 ferr.write(json.dumps(data, ensure_ascii=False) + "\n")
 
+    evaluator.close()
+    if semantic_cache:
+        semantic_cache.close()
+
+    if args.efficiency_runs and stats["total"]:
+        # BIRD VES: every question counts, unanswered or wrong ones with a reward of 0.
+        stats["ves"] = 100 * stats["ves_sum"] / stats["total"]
+    if stats["semantic_cache_lookups"]:
+        stats["semantic_cache_hit_rate"] = stats["semantic_cache_hits"] / stats["semantic_cache_lookups"]
+
     os.makedirs(os.path.dirname(args.stats_file), exist_ok=True)
     with open(args.stats_file, 'w', encoding='utf-8') as f_stats:
         json.dump(stats, f_stats, indent=4)
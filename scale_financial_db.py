@@ -0,0 +1,171 @@
+import argparse
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+from bird_db_registry import get_registry
+from bird_db_reader import scaled_filename
+
+# Fact tables grown by the generator; every other table (district, account, disp, card, loan)
+# is copied unchanged, so the A2 / k_symbol vocabularies and all referenced keys stay the same.
+SCALED_TABLES = ("trans", "order", "client")
+
+
+class ScaledDBGenerator:
+    def __init__(self, source_path, scale, output_path=None, tables=SCALED_TABLES, seed=0, chunk_size=100000):
+        """
+        Builds <stem>_x<scale>.sqlite: a copy of a BIRD database whose scaled tables hold
+        scale times as many rows. The source rows are kept; the extra rows are drawn from them
+        with replacement and get new primary keys. Every other column, foreign keys included,
+        comes from the drawn row, so references stay valid and the joint value distribution
+        of each table (e.g. type / operation / k_symbol combinations) is preserved.
+        """
+        if scale < 2:
+            raise ValueError("scale must be at least 2")
+        self.source_path = os.path.abspath(source_path)
+        self.scale = scale
+        self.output_path = output_path or scaled_filename(self.source_path, scale)
+        self.tables = tables
+        self.seed = seed
+        self.chunk_size = chunk_size
+
+    @staticmethod
+    def _columns(conn, table):
+        """
+        Returns (column names, primary key column) of a table.
+        """
+        info = conn.execute(f'PRAGMA table_info("{table}")').fetchall()
+        primary_keys = [row[1] for row in info if row[5]]
+        if len(primary_keys) != 1:
+            raise ValueError(f"Table '{table}' needs a single-column primary key to be scaled")
+        return [row[1] for row in info], primary_keys[0]
+
+    def _scale_table(self, conn, table, rng):
+        columns, primary_key = self._columns(conn, table)
+        pk_index = columns.index(primary_key)
+        column_list = ", ".join(f'"{col}"' for col in columns)
+        rows = conn.execute(f'SELECT {column_list} FROM "{table}" ORDER BY "{primary_key}"').fetchall()
+        if not rows:
+            return 0
+
+        next_key = conn.execute(f'SELECT MAX("{primary_key}") FROM "{table}"').fetchone()[0] + 1
+        insert = f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join("?" * len(columns))})'
+        total = len(rows) * (self.scale - 1)
+        for offset in range(0, total, self.chunk_size):
+            picks = rng.integers(0, len(rows), size=min(self.chunk_size, total - offset))
+            batch = []
+            for key, pick in enumerate(picks.tolist(), start=next_key + offset):
+                row = list(rows[pick])
+                row[pk_index] = key
+                batch.append(row)
+            conn.executemany(insert, batch)
+        return total
+
+    def build(self):
+        """
+        Copies the source with the SQLite backup API and appends the drawn rows.
+        The same seed always produces the same database. Returns {table: rows added}.
+        """
+        tmp_path = f"{self.output_path}.tmp"
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        target = sqlite3.connect(tmp_path)
+        rng = np.random.default_rng(self.seed)
+        added = {}
+        try:
+            source.backup(target)
+            target.execute("PRAGMA journal_mode = OFF")
+            target.execute("PRAGMA synchronous = OFF")
+            for table in self.tables:
+                start = time.perf_counter()
+                added[table] = self._scale_table(target, table, rng)
+                target.commit()
+                print(f"   -> {table}: +{added[table]} rows ({time.perf_counter() - start:.1f}s)")
+        finally:
+            target.close()
+            source.close()
+
+        os.replace(tmp_path, self.output_path)
+        return added
+
+    def verify(self):
+        """
+        Compares the scaled copy with the source: row counts, foreign-key violations and, per
+        column the NULL share, the distinct TEXT values and the mean of numeric values.
+        Drawing with replacement keeps the shares and means close, not identical.
+        """
+        source = sqlite3.connect(f"file:{self.source_path}?mode=ro", uri=True)
+        scaled = sqlite3.connect(f"file:{os.path.abspath(self.output_path)}?mode=ro", uri=True)
+        report = {"tables": {}}
+        try:
+            # Violations already present in the source are carried over; drawn rows add none.
+            for name, conn in (("source", source), ("scaled", scaled)):
+                report[f"{name}_foreign_key_violations"] = len(conn.execute("PRAGMA foreign_key_check").fetchall())
+            for table in self.tables:
+                columns, _ = self._columns(source, table)
+                table_report = {"columns": {}}
+                for name, conn in (("source", source), ("scaled", scaled)):
+                    table_report[f"{name}_rows"] = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+                for col in columns:
+                    stats = {}
+                    for name, conn in (("source", source), ("scaled", scaled)):
+                        null_share, mean = conn.execute(
+                            f'SELECT AVG("{col}" IS NULL), AVG(CASE WHEN typeof("{col}") IN (\'integer\', \'real\') '
+                            f'THEN "{col}" END) FROM "{table}"'
+                        ).fetchone()
+                        stats[f"{name}_null_share"] = round(null_share or 0.0, 4)
+                        if mean is not None:
+                            stats[f"{name}_mean"] = round(mean, 2)
+                    text_values = [
+                        set(row[0] for row in conn.execute(
+                            f'SELECT DISTINCT "{col}" FROM "{table}" WHERE typeof("{col}") = \'text\''
+                        ))
+                        for conn in (source, scaled)
+                    ]
+                    if text_values[0] or text_values[1]:
+                        stats["same_text_values"] = text_values[0] == text_values[1]
+                    table_report["columns"][col] = stats
+                report["tables"][table] = table_report
+        finally:
+            scaled.close()
+            source.close()
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a scale-factor copy of a BIRD database")
+    parser.add_argument("--scale", type=int, default=10, help="Row multiplier for the scaled tables")
+    parser.add_argument("--db_id", type=str, default="financial")
+    parser.add_argument("--db_path", type=str, default=None, help="Source database (default: resolved from --db_id)")
+    parser.add_argument("--output", type=str, default=None, help="Copy path (default: <stem>_x<scale>.sqlite next to the source)")
+    parser.add_argument("--tables", type=str, nargs="+", default=list(SCALED_TABLES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip_verify", action="store_true")
+    args = parser.parse_args()
+
+    try:
+        source_path = get_registry().resolve(args.db_path) if args.db_path else get_registry().resolve_db_id(args.db_id)
+    except FileNotFoundError:
+        print(f"ERROR: database for '{args.db_id}' could not be found under the project directory.")
+        exit(1)
+
+    generator = ScaledDBGenerator(source_path, args.scale, output_path=args.output, tables=args.tables, seed=args.seed)
+    print(f"Building {generator.output_path}")
+    added = generator.build()
+    print(f"Added {sum(added.values())} rows")
+
+    if args.skip_verify:
+        return
+
+    report = generator.verify()
+    print(json.dumps(report, indent=4))
+    if report["scaled_foreign_key_violations"] > report["source_foreign_key_violations"]:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+import multiprocessing
+import queue
+import sqlite3
+import threading
+import time
+from bird_db_reader import BirdDBReader, QueryTimeoutError
+
+try:
+    import resource
+except ImportError:
+    # Windows has no RLIMIT_AS; the SQLite heap limit still applies there.
+    resource = None
+
+
+class WorkerCrashedError(Exception):
+    """Raised when a SQL worker process dies (e.g. killed by the OS) while running a query."""
+
+
+class WorkerMemoryError(Exception):
+    """Raised when a query exceeds the memory limit of its SQL worker process."""
+
+
+def _apply_memory_limit(memory_limit_mb):
+    """
+    Caps the worker: SQLite's own heap (PRAGMA hard_heap_limit, SQLite >= 3.31, every platform)
+    and, where the resource module exists, the address space of the whole process (RLIMIT_AS).
+    The address-space cap adds the interpreter's footprint at startup on top of memory_limit_mb.
+    """
+    limit_bytes = int(memory_limit_mb * 1024 * 1024)
+    conn = sqlite3.connect(":memory:")
+    conn.execute(f"PRAGMA hard_heap_limit = {limit_bytes}")
+    conn.close()
+
+    if resource is None or not hasattr(resource, "RLIMIT_AS"):
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            baseline = int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        baseline = 0
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    soft = baseline + limit_bytes
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _worker_main(conn, memory_limit_mb, reader_options):
+    """
+    Worker loop: receives query requests over the pipe and streams back
+    ("columns", names), ("rows", batch)..., ("done", None) or ("error", (kind, message)).
+    A None request stops the worker.
+    """
+    if memory_limit_mb:
+        _apply_memory_limit(memory_limit_mb)
+    readers = {}
+
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+
+        try:
+            reader = readers.get(request["db_path"])
+            if reader is None:
+                reader = readers[request["db_path"]] = BirdDBReader(request["db_path"], pool_size=1, **reader_options)
+            stream = reader.stream_select_query(
+                request["sql"],
+                batch_size=request["batch_size"],
+                include_columns=True,
+                timeout_seconds=request["timeout_seconds"],
+                max_vm_steps=request["max_vm_steps"]
+            )
+            conn.send(("columns", next(stream)))
+            for batch in stream:
+                conn.send(("rows", batch))
+            conn.send(("done", None))
+        except QueryTimeoutError as e:
+            conn.send(("error", ("timeout", str(e))))
+        except MemoryError:
+            conn.send(("error", ("memory", "Worker memory limit exceeded")))
+        except sqlite3.Error as e:
+            kind = "memory" if "out of memory" in str(e).lower() else "sql"
+            conn.send(("error", (kind, str(e))))
+        except Exception as e:
+            conn.send(("error", ("sql", str(e))))
+
+
+class _Worker:
+    def __init__(self, context, memory_limit_mb, reader_options):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, memory_limit_mb, reader_options),
+            daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+
+    def stop(self, kill=False):
+        if kill:
+            self.process.kill()
+        else:
+            try:
+                self.conn.send(None)
+            except OSError:
+                pass
+        self.process.join(timeout=5)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class SQLExecutorPool:
+    def __init__(self, workers=2, memory_limit_mb=1024, kill_timeout_seconds=300, kill_grace_seconds=5,
+                 reader_options=None):
+        """
+        Pool of worker processes that run SELECT queries away from the calling process.
+        Each worker is capped at memory_limit_mb and queries are hard-killed after
+        kill_timeout_seconds (or their own timeout_seconds + kill_grace_seconds), in case
+        SQLite's progress handler cannot interrupt them. Killed or crashed workers are
+        replaced, and the failure is raised for that query only.
+        """
+        self.memory_limit_mb = memory_limit_mb
+        self.kill_timeout_seconds = kill_timeout_seconds
+        self.kill_grace_seconds = kill_grace_seconds
+        self.reader_options = reader_options or {}
+        # Spawned, not forked: a worker replaced mid-run must not inherit the parent's locks and
+        # open SQLite connections, which other threads may hold at the moment of a fork.
+        self._context = multiprocessing.get_context("spawn")
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        for _ in range(workers):
+            self._idle.put(self._start_worker())
+
+    def _start_worker(self):
+        return _Worker(self._context, self.memory_limit_mb, self.reader_options)
+
+    def _acquire(self):
+        worker = self._idle.get()
+        if not worker.process.is_alive():
+            worker.stop(kill=True)
+            worker = self._start_worker()
+        return worker
+
+    def _release(self, worker):
+        if self._closed:
+            worker.stop()
+        else:
+            self._idle.put(worker)
+
+    def _replace(self, worker):
+        worker.stop(kill=True)
+        if self._closed:
+            return
+        self._idle.put(self._start_worker())
+
+    def stream(self, db_path, sql, batch_size=1000, timeout_seconds=None, max_vm_steps=None):
+        """
+        Runs sql in a worker and yields the column names first, then row batches,
+        like BirdDBReader.stream_select_query(include_columns=True).
+        Raises QueryTimeoutError, WorkerMemoryError, WorkerCrashedError or sqlite3.Error.
+        """
+        kill_after = self.kill_timeout_seconds
+        if timeout_seconds:
+            kill_after = timeout_seconds + self.kill_grace_seconds
+        deadline = time.monotonic() + kill_after if kill_after else None
+
+        worker = self._acquire()
+        reusable = False
+        try:
+            worker.conn.send({
+                "db_path": db_path,
+                "sql": sql,
+                "batch_size": batch_size,
+                "timeout_seconds": timeout_seconds,
+                "max_vm_steps": max_vm_steps
+            })
+            while True:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not worker.conn.poll(remaining):
+                        raise QueryTimeoutError(f"Query worker killed after {kill_after}s")
+
+                kind, payload = worker.conn.recv()
+                if kind in ("columns", "rows"):
+                    yield payload
+                elif kind == "done":
+                    reusable = True
+                    return
+                else:
+                    error_kind, message = payload
+                    if error_kind == "timeout":
+                        reusable = True
+                        raise QueryTimeoutError(message)
+                    if error_kind == "memory":
+                        raise WorkerMemoryError(message)
+                    reusable = True
+                    raise sqlite3.OperationalError(message)
+        except (EOFError, OSError) as e:
+            worker.process.join(timeout=1)
+            raise WorkerCrashedError(f"SQL worker exited unexpectedly (exit code {worker.process.exitcode})") from e
+        finally:
+            # Workers that were killed, crashed, hit the memory cap or were abandoned mid-stream are replaced.
+            if reusable:
+                self._release(worker)
+            else:
+                self._replace(worker)
+
+    def probe(self, db_path, sql, row_cap, timeout_seconds=None, max_vm_steps=None):
+        """
+        BirdDBReader.probe_select_query run in a worker: returns (column_names, row_count),
+        the count stopping at row_cap.
+        """
+        columns_sql, count_sql = BirdDBReader.probe_queries(sql, row_cap)
+        budget = {"timeout_seconds": timeout_seconds, "max_vm_steps": max_vm_steps}
+        # Streams are read to the end so the worker goes back to the pool instead of being replaced.
+        columns = list(self.stream(db_path, columns_sql, **budget))[0]
+        row_count = list(self.stream(db_path, count_sql, **budget))[1][0][0]
+        return columns, row_count
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -3,20 +3,29 @@ import os
 import argparse
 from tqdm import tqdm
 from onePassLlmModel.bird_pipeline import BirdSQLPipeline
-def load_test_data(filepath):
+from bird_db_reader import scaled_filename
+from onePassLlmModel.semantic_cache import DEFAULT_SEMANTIC_CACHE_PATH
+def load_test_data(filepath, db_id="financial"):
     if not os.path.exists(filepath):
         return []
     
     with open(filepath, 'r', encoding='utf-8') as f:
         data = json.load(f)
     
-    financial_data = [d for d in data if d.get('db_id') == 'financial']
-    
-    return financial_data
+    if db_id == "all":
+        return data
+
+    return [d for d in data if d.get('db_id') == db_id]
 
 def update_stats(stats, res):
     stats["total"] += 1
     status = res.get("status")
+
+    stats["semantic_lexical_hits"] += res.get("metrics", {}).get("semantic_lexical_hits", 0)
+    semantic_cache = res.get("metrics", {}).get("semantic_cache")
+    if semantic_cache:
+        stats["semantic_cache_lookups"] += sum(semantic_cache.values())
+        stats["semantic_cache_hits"] += semantic_cache["memory_hits"] + semantic_cache["disk_hits"]
     
     if status == "filtered_by_router":
         stats["router_filtered"] += 1
@@ -38,8 +47,14 @@ def update_stats(stats, res):
             elif match_type == "SUPER_SOFT_MATCH":
                 stats["super_soft_match"] += 1
                 stats["success"] += 1
+            elif res["steps"]["evaluator"].get("execution_status") == "TIMEOUT":
+                stats["timeouts"] += 1
+            elif res["steps"]["evaluator"].get("execution_status") == "SKIPPED":
+                stats["plan_skipped"] += 1
             else:
                 stats["wrong"] += 1
+            if res["steps"]["evaluator"].get("ves") is not None:
+                stats["ves_sum"] += res["steps"]["evaluator"]["ves"]
         else:
             stats["errors"] += 1
     else:
@@ -53,15 +68,60 @@ def main():
     parser.add_argument("--output", type=str, default="results/pipeline_test_report_gpt_with_hint.jsonl")
     parser.add_argument("--hint", type=bool, default=True)
     parser.add_argument("--model", type=str, default="gpt")
+    parser.add_argument("--timeout", type=float, default=None, help="Wall-clock budget (seconds) per predicted query")
+    parser.add_argument("--max_vm_steps", type=int, default=None, help="SQLite VM-step budget per predicted query")
+    parser.add_argument("--plan_gate", type=str, default=None, choices=["record", "skip", "down_budget"],
+                        help="Inspect EXPLAIN QUERY PLAN before execution and record, skip or down-budget costly plans")
+    parser.add_argument("--gated_timeout", type=float, default=2.0, help="Wall-clock budget (seconds) for down-budgeted plans")
+    parser.add_argument("--accelerated", action="store_true", help="Read from the indexed copy built by build_accelerated_db.py")
+    parser.add_argument("--db_mode", type=str, default="file", choices=["file", "memory", "mmap"],
+                        help="Serve queries from the file, an in-memory copy or a memory-mapped file")
+    parser.add_argument("--memory_limit_mb", type=int, default=2048, help="Largest database copied into memory")
+    parser.add_argument("--efficiency_runs", type=int, default=0,
+                        help="Re-run matching predictions and their GT this many times to compute VES (0: off)")
+    parser.add_argument("--db_id", type=str, default="financial", help="BIRD database to test, or 'all' for every dev database")
+    parser.add_argument("--max_open_databases", type=int, default=4, help="Databases kept open at once when testing several")
+    parser.add_argument("--isolated_workers", type=int, default=0,
+                        help="Run predicted SQL in this many memory-capped worker processes (0: in-process)")
+    parser.add_argument("--worker_memory_mb", type=int, default=1024, help="Memory cap of each SQL worker process")
+    parser.add_argument("--optimize_plans", action="store_true",
+                        help="Rewrite plan conditions into index-friendly, simplified form before compiling")
+    parser.add_argument("--semantic_backend", type=str, default="chroma", choices=["chroma", "numpy"],
+                        help="Resolve SEMANTIC values with Chroma or with the exact NumPy kNN export")
+    parser.add_argument("--no_lexical_fast_path", action="store_true",
+                        help="Resolve every SEMANTIC value by vector search, even exact or near-exact database values")
+    parser.add_argument("--no_semantic_cache", action="store_true",
+                        help="Resolve every SEMANTIC value with a vector query instead of the semantic cache")
+    parser.add_argument("--scale", type=int, default=1,
+                        help="Evaluate on the <db>_x<scale>.sqlite copy built by scale_financial_db.py (1: the original)")
     args = parser.parse_args()
 
-    pipeline = BirdSQLPipeline(model=args.model)
+    pipeline = BirdSQLPipeline(
+        model=args.model,
+        db_path=scaled_filename("financial.sqlite", args.scale),
+        timeout_seconds=args.timeout,
+        max_vm_steps=args.max_vm_steps,
+        plan_gate=args.plan_gate,
+        gated_timeout_seconds=args.gated_timeout,
+        prefer_accelerated=args.accelerated,
+        db_mode=args.db_mode,
+        memory_limit_mb=args.memory_limit_mb,
+        efficiency_runs=args.efficiency_runs,
+        max_open_databases=args.max_open_databases,
+        isolated_workers=args.isolated_workers,
+        worker_memory_limit_mb=args.worker_memory_mb,
+        optimize_plans=args.optimize_plans,
+        semantic_cache_path=None if args.no_semantic_cache else DEFAULT_SEMANTIC_CACHE_PATH,
+        semantic_backend=args.semantic_backend,
+        lexical_fast_path=not args.no_lexical_fast_path
+    )
 
-    test_data = load_test_data(args.data_path)
-    test_data_2 = load_test_data(args.data_path_2)
+    test_data = load_test_data(args.data_path, args.db_id)
+    test_data_2 = load_test_data(args.data_path_2, args.db_id)
     test_data.extend(test_data_2)
     
     if not test_data:
+        pipeline.close()
         return
     
     if args.limit > 0:
@@ -74,9 +134,15 @@ def main():
         "soft_match": 0,
         "super_soft_match": 0,
         "wrong": 0,
+        "timeouts": 0,
+        "plan_skipped": 0,
         "errors": 0,
         "router_filtered": 0,
-        "total_tokens": 0
+        "total_tokens": 0,
+        "ves_sum": 0.0,
+        "semantic_lexical_hits": 0,
+        "semantic_cache_lookups": 0,
+        "semantic_cache_hits": 0
     }
     processed_count = 0
     if os.path.exists(args.output):
@@ -94,6 +160,7 @@ def main():
     if processed_count < len(test_data):
         test_data_to_process = test_data[processed_count:]
     else:
+        pipeline.close()
         return
 
     with open(args.output, 'a', encoding='utf-8', buffering=1) as f:
@@ -106,14 +173,20 @@ def main():
                 hint = item.get('evidence')
             else:
                 hint = None
-            res = pipeline.process_query(query, ground_truth_sql=gt_sql, hint=hint)
+            res = pipeline.process_query(query, db_id=item['db_id'], ground_truth_sql=gt_sql, hint=hint)
 
             update_stats(stats, res)
 
             f.write(json.dumps(res, ensure_ascii=False) + "\n")
             f.flush() 
+    pipeline.close()
 
 
+    if args.efficiency_runs and stats["total"]:
+        # BIRD VES: every question counts, unanswered or wrong ones with a reward of 0.
+        stats["ves"] = 100 * stats["ves_sum"] / stats["total"]
+    if stats["semantic_cache_lookups"]:
+        stats["semantic_cache_hit_rate"] = stats["semantic_cache_hits"] / stats["semantic_cache_lookups"]
  
     print(json.dumps(stats, indent=4))
     
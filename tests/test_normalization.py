@@ -0,0 +1,98 @@
+"""
+Regression tests: the evaluator's default rendering must give the verdicts of the original
+pandas path (legacy_normalize_rows), whatever the execution mode.
+"""
+import itertools
+import os
+import sqlite3
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from bird_evaluator import BirdEvaluator, legacy_normalize_rows
+
+# (GT, prediction) pairs over INTEGER columns holding NULLs and REAL vs INTEGER columns
+QUERY_PAIRS = [
+    ("SELECT c FROM mixed", "SELECT CAST(c AS REAL) FROM mixed"),
+    ("SELECT c FROM mixed", "SELECT c FROM mixed WHERE c IS NOT NULL UNION ALL SELECT NULL"),
+    ("SELECT c FROM mixed WHERE c IS NOT NULL", "SELECT CAST(c AS REAL) FROM mixed WHERE c IS NOT NULL"),
+    ("SELECT c, r FROM mixed", "SELECT c, r FROM mixed"),
+    ("SELECT c, r FROM mixed WHERE c IS NOT NULL", "SELECT CAST(c AS REAL), r FROM mixed WHERE c IS NOT NULL"),
+    ("SELECT c, t FROM mixed", "SELECT CAST(c AS REAL), t FROM mixed"),
+    ("SELECT r FROM mixed WHERE r = 3.0", "SELECT 3"),
+    ("SELECT SUM(c) FROM mixed", "SELECT SUM(CAST(c AS REAL)) FROM mixed"),
+    ("SELECT c, t FROM mixed ORDER BY t", "SELECT c, t FROM mixed ORDER BY t DESC"),
+]
+
+MODES = [
+    dict(zip(("digest_mode", "probe_predictions", "concurrent_execution", "batch_size"), values))
+    for values in itertools.product((False, True), (False, True), (False, True), (1, 1000))
+]
+
+
+@pytest.fixture(scope="module")
+def db_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("db") / "mixed.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE mixed (c INTEGER, r REAL, t TEXT)")
+    # The NULL of c comes last, so batched reads only see it after the other rows.
+    conn.executemany("INSERT INTO mixed VALUES (?, ?, ?)",
+                     [(3, 3.0, "x"), (4, 4.5, None), (5, 5.0, "y"), (None, None, "z")])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def _legacy_verdict(evaluator, db_path, gt_sql, pred_sql):
+    conn = sqlite3.connect(db_path)
+    try:
+        results = []
+        for sql in (gt_sql, pred_sql):
+            cursor = conn.execute(sql)
+            cols = [str(desc[0]).strip().lower() for desc in cursor.description]
+            results.append((legacy_normalize_rows(cursor.fetchall()), cols))
+    finally:
+        conn.close()
+    (gt_rows, gt_cols), (pred_rows, pred_cols) = results
+    return evaluator._compare_results(gt_rows, pred_rows, gt_cols, pred_cols)[0]
+
+
+@pytest.mark.parametrize("mode", MODES, ids=lambda mode: "-".join(f"{k}={v}" for k, v in mode.items()))
+def test_verdicts_match_legacy_path(db_path, mode):
+    with BirdEvaluator(db_path, result_cache_path=None, digest_keep_rows=2, **mode) as evaluator:
+        for idx, (gt_sql, pred_sql) in enumerate(QUERY_PAIRS):
+            expected = _legacy_verdict(evaluator, db_path, gt_sql, pred_sql)
+            result = evaluator.evaluate_query(idx, "q", gt_sql, pred_sql)
+            assert result["match_type"] == expected, (gt_sql, pred_sql, result["failure_reason"])
+
+
+def test_rows_render_like_legacy_path(db_path):
+    with BirdEvaluator(db_path, result_cache_path=None, batch_size=1) as evaluator:
+        rows, _, err = evaluator._execute_sql("SELECT c, r, t FROM mixed")
+    assert err is None
+    conn = sqlite3.connect(db_path)
+    try:
+        expected = legacy_normalize_rows(conn.execute("SELECT c, r, t FROM mixed").fetchall())
+    finally:
+        conn.close()
+    assert rows == expected
+    assert rows[0] == ("3.0", "3.0", "x")
+    assert rows[-1] == ("nan", "nan", "z")
+
+
+def test_typed_normalization_is_opt_in(db_path):
+    with BirdEvaluator(db_path, result_cache_path=None, typed_normalization=True) as evaluator:
+        result = evaluator.evaluate_query(0, "q", "SELECT c FROM mixed", "SELECT CAST(c AS REAL) FROM mixed")
+    assert result["match_type"] == "WRONG"
+
+
+def test_digest_multiset_settles_reordered_rows(db_path):
+    with BirdEvaluator(db_path, result_cache_path=None, digest_mode=True, digest_keep_rows=2) as evaluator:
+        def refetch(*args, **kwargs):
+            raise AssertionError("equal multisets must not fetch the rows again")
+
+        evaluator._execute_sql = refetch
+        result = evaluator.evaluate_query(0, "q", "SELECT c, t FROM mixed ORDER BY t",
+                                          "SELECT c, t FROM mixed ORDER BY t DESC")
+    assert result["match_type"] == "STRICT_EXACT_MATCH"
@@ -1,15 +1,20 @@
 import sqlite3
 import json
 import pandas as pd
-import chromadb
-from chromadb.utils import embedding_functions
 import os
+import uuid
+from bird_db_registry import get_registry
+from onePassLlmModel.semantic_resources import get_semantic_resources
+from onePassLlmModel.semantic_cache import SemanticCache, DEFAULT_SEMANTIC_CACHE_PATH
+from onePassLlmModel.numpy_knn import export_collection, DEFAULT_NUMPY_INDEX_DIR
+from onePassLlmModel.lexical_index import LexicalIndex, DEFAULT_LEXICAL_INDEX_DIR
 
 from pyparsing import col
 
 class VectorDBBuilder:
-    def __init__(self, db_path, info_path, db_id='financial'):
-        self.db_path = db_path
+    def __init__(self, db_path, info_path, db_id='financial', semantic_cache_path=DEFAULT_SEMANTIC_CACHE_PATH,
+                 numpy_index_dir=DEFAULT_NUMPY_INDEX_DIR, lexical_index_dir=DEFAULT_LEXICAL_INDEX_DIR):
+        self.db_path = db_path or get_registry().resolve_db_id(db_id)
         self.db_id = db_id
         BASE_DIR = os.path.dirname(os.path.abspath(__file__))
         info_path = os.path.join(BASE_DIR, 'info', info_path)
@@ -19,13 +24,13 @@ class VectorDBBuilder:
             self.full_info = json.load(f)
             self.db_info = self.full_info[db_id]
             
-        # Initialize ChromaDB (Persistent)
-        self.chroma_client = chromadb.PersistentClient(path="./chroma_db")
-        
-        # Embedding Function (using a lightweight model)
-        self.emb_fn = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="paraphrase-multilingual-MiniLM-L12-v2"
-        )
+        # ChromaDB (Persistent) and the embedding model, shared with the compilers of this process
+        self.resources = get_semantic_resources("./chroma_db")
+        self.chroma_client = self.resources.client
+        self.emb_fn = self.resources.embedding_function
+        self.semantic_cache_path = semantic_cache_path
+        self.numpy_index_dir = numpy_index_dir
+        self.lexical_index_dir = lexical_index_dir
 
     def build_collections(self):
         semantic_cols = self.db_info.get('text_columns', [])
@@ -34,6 +39,7 @@ class VectorDBBuilder:
         mappings = self.db_info.get('value_mappings', {})
         
         conn = sqlite3.connect(self.db_path)
+        semantic_cache = SemanticCache(self.semantic_cache_path) if self.semantic_cache_path else None
         
         print(f"--- Starting Vectorization for {len(semantic_cols)} columns ---")
         
@@ -49,10 +55,17 @@ class VectorDBBuilder:
             except:
                 pass
             
+            # A fresh build_id per build tells semantic caches that resolutions of the old one are stale
+            build_id = uuid.uuid4().hex
             collection = self.chroma_client.create_collection(
                 name=collection_name,
-                embedding_function=self.emb_fn
+                embedding_function=self.emb_fn,
+                metadata={"build_id": build_id}
             )
+            # Cached handles and resolutions of the deleted collection are stale now
+            self.resources.invalidate(collection_name)
+            if semantic_cache:
+                semantic_cache.invalidate(collection_name)
             
             # 2. Strategy: Check if Mapping exists (e.g., k_symbol -> "insurance payment")
             # Mappings can be namespaced (loan.status) or generic (k_symbol)
@@ -98,7 +111,20 @@ class VectorDBBuilder:
             else:
                 print("   -> No data found!")
 
+            # 4. Export for the NumPy exact-kNN backend (always, so no stale export survives a rebuild)
+            if self.numpy_index_dir:
+                exported = export_collection(collection, self.numpy_index_dir)
+                print(f"   -> Exported {exported} embeddings to '{self.numpy_index_dir}/{collection_name}'")
+
+            # 5. Lexical index (exact / trigram matches resolved without the embedding model)
+            if self.lexical_index_dir:
+                lexical_index = LexicalIndex.from_collection_items(documents, metadatas, build_id)
+                lexical_index.save(os.path.join(self.lexical_index_dir, f"{collection_name}.json"))
+                print(f"   -> Lexical index: {len(lexical_index.exact)} keys")
+
         conn.close()
+        if semantic_cache:
+            semantic_cache.close()
         print("\n Vector Database Built Successfully in ./chroma_db")
 
     def list_collections(self):
@@ -108,12 +134,11 @@ class VectorDBBuilder:
             print(f" - {col.name}")
 
 if __name__ == "__main__":
-    BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-    DB_PATH = os.path.join(BASE_DIR, 'data', 'dev_20240627', 'dev_databases', 'financial', 'financial.sqlite')
-    DB_PATH = os.path.abspath(DB_PATH)
-    if not os.path.exists(DB_PATH):
-        print(f"ERROR: DB file could not find in:\n{DB_PATH}")
-        print("please try 'find . -name financial.sqlite' in terminal and paste here in the code.")
+    try:
+        DB_PATH = get_registry().resolve_db_id('financial')
+    except FileNotFoundError:
+        print("ERROR: financial.sqlite could not be found under the project directory.")
+        print("please download the BIRD dev databases into the data/ folder.")
         exit(1)
         
     builder = VectorDBBuilder(